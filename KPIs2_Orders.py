@@ -13,6 +13,7 @@ from datetime import datetime
 from config import updated_ORDERS
 from leaky_bucket import leaky_bucket
 from risklimits import compute_risk_metrics
+from ctd_fut_kpis import HedgeCombos
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -30,6 +31,17 @@ def accrued_interest(coupon, mat_date, today):
     days_accrued = (today - last_coupon).days
     return (coupon / 2) * (days_accrued / 182.5)
 
+def accrued_interest_vec(coupon, mat_date, today):
+    """accrued_interest over whole columns: maturity month/day rolled into today's year, back 6 months if ahead."""
+    mat = pd.Series(pd.to_datetime(mat_date, errors="coerce"))
+    first = pd.to_datetime(pd.DataFrame({"year": today.year, "month": mat.dt.month, "day": 1}), errors="coerce")
+    day = np.minimum(mat.dt.day, first.dt.days_in_month)   # Feb 29 maturities fall back to month end
+    last_coupon = first + pd.to_timedelta(day - 1, unit="D")
+    last_coupon = last_coupon.where(last_coupon <= today, last_coupon - pd.DateOffset(months=6))
+    days_accrued = (today - last_coupon).dt.days.to_numpy(dtype=float)
+    return (np.asarray(coupon, dtype=float) / 2) * (days_accrued / 182.5)
+
+# The sia_* derivations are plain arithmetic and take scalars or whole columns alike.
 def sia_implied_repo(fut_price, dirty_price, cf, days):
     adj_fut = fut_price * cf
     return (((adj_fut - dirty_price) / dirty_price)-1) * (365 / days)
@@ -105,23 +117,18 @@ def calculate_quantities_with_sma(HEDGES_Combos):
     today = pd.to_datetime(datetime.now())
 
     for leg in ['A', 'B']:
-        coupons = HEDGES_Combos[f'{leg}_CTD_COUPON_RATE']
-        mat_dates = pd.to_datetime(HEDGES_Combos[f'{leg}_CTD_MATURITY_DATE'])
-        HEDGES_Combos[f'{leg}_AccruedInterest'] = [accrued_interest(c, m, today) for c, m in zip(coupons, mat_dates)]
+        for c in ['CTD_COUPON_RATE', 'CTD_GROSS_BASIS', 'CTD_IRR', 'CTD_BPRICE']:
+            HEDGES_Combos[f'{leg}_{c}'] = pd.to_numeric(HEDGES_Combos[f'{leg}_{c}'], errors='coerce')
+        HEDGES_Combos[f'{leg}_AccruedInterest'] = accrued_interest_vec(
+            HEDGES_Combos[f'{leg}_CTD_COUPON_RATE'], HEDGES_Combos[f'{leg}_CTD_MATURITY_DATE'], today)
 
         col = f"{leg}_FUT_EXPIRY"
         HEDGES_Combos[col] = pd.to_datetime(HEDGES_Combos[col].astype(str), format="%Y%m%d", errors="coerce")
         HEDGES_Combos[f"{leg}_Days"] = (HEDGES_Combos[col] - today).dt.days.astype("Int64")
-        HEDGES_Combos[f'{leg}_Carry'] = [
-            sia_carry(gb, repo, dp, d)
-            for gb, repo, dp, d in zip(
-                HEDGES_Combos[f'{leg}_CTD_GROSS_BASIS'],
-                HEDGES_Combos[f'{leg}_CTD_IRR'],
-                HEDGES_Combos[f'{leg}_CTD_BPRICE'],
-                HEDGES_Combos[f'{leg}_Days'])]
-        HEDGES_Combos[f'{leg}_NetBasis'] = [
-            sia_net_basis(gb, carry)
-            for gb, carry in zip(HEDGES_Combos[f'{leg}_CTD_GROSS_BASIS'], HEDGES_Combos[f'{leg}_Carry'])]
+        days = HEDGES_Combos[f"{leg}_Days"].to_numpy(dtype=float, na_value=np.nan)
+        HEDGES_Combos[f'{leg}_Carry'] = sia_carry(HEDGES_Combos[f'{leg}_CTD_GROSS_BASIS'], HEDGES_Combos[f'{leg}_CTD_IRR'],
+                                                  HEDGES_Combos[f'{leg}_CTD_BPRICE'], days)
+        HEDGES_Combos[f'{leg}_NetBasis'] = sia_net_basis(HEDGES_Combos[f'{leg}_CTD_GROSS_BASIS'], HEDGES_Combos[f'{leg}_Carry'])
 
     nl_value = get_acct_dets()
     nl_value = float(nl_value)
@@ -130,7 +137,16 @@ def calculate_quantities_with_sma(HEDGES_Combos):
     print(f'SMA => {SMA}')
     return config.SMA
 
-def calculate_quantities(HEDGES_Combos):
+# HEDGES columns the ranking stage reads from each leg; everything else stays in HEDGES
+# and is only gathered for the pairs that become ORDERS.
+KPI_LEG_COLUMNS = ['CTD_COUPON_RATE', 'CTD_MATURITY_DATE', 'FUT_EXPIRY', 'CTD_GROSS_BASIS', 'CTD_IRR',
+                   'CTD_BPRICE', 'FUT_YEAR_TO_MATURITY', 'FUT_VOLUME', 'FUT_MULTIPLIER', 'FUT_CONID']
+
+def calculate_quantities(HEDGES_Combos, k=3):
+    combos = None
+    if isinstance(HEDGES_Combos, HedgeCombos):
+        combos = HEDGES_Combos
+        HEDGES_Combos = combos.to_frame(KPI_LEG_COLUMNS)
     SMA = calculate_quantities_with_sma(HEDGES_Combos)
     if SMA > 2000:
         HEDGES_Combos['A_Q_Value'], HEDGES_Combos['B_Q_Value'] = 1, 1
@@ -140,9 +156,9 @@ def calculate_quantities(HEDGES_Combos):
             HEDGES_Combos['A_CTD_IRR'] < HEDGES_Combos['B_CTD_IRR'], 1, -1)
 
     HEDGES_Combos = filter_updated_orders(HEDGES_Combos)
-    # Convert volume columns to numeric.
-    HEDGES_Combos['A_FUT_VOLUME'] = pd.to_numeric(HEDGES_Combos['A_FUT_VOLUME'], errors='coerce')
-    HEDGES_Combos['B_FUT_VOLUME'] = pd.to_numeric(HEDGES_Combos['B_FUT_VOLUME'], errors='coerce')
+    # Single numeric pass over the columns the ranking reads (NetBasis is already numeric from the SMA step).
+    for c in ['A_FUT_VOLUME', 'B_FUT_VOLUME', 'A_FUT_MULTIPLIER', 'B_FUT_MULTIPLIER', 'A_Q_Value', 'B_Q_Value']:
+        HEDGES_Combos[c] = pd.to_numeric(HEDGES_Combos[c], errors='coerce')
     HEDGES_Combos = HEDGES_Combos.dropna(subset=['A_FUT_VOLUME', 'B_FUT_VOLUME'])
     HEDGES_Combos['ln_A_FUT'] = np.log(HEDGES_Combos['A_FUT_VOLUME'])
     HEDGES_Combos['ln_B_FUT'] = np.log(HEDGES_Combos['B_FUT_VOLUME'])
@@ -151,21 +167,6 @@ def calculate_quantities(HEDGES_Combos):
     HEDGES_Combos['Z_Ln_WeightedVol'] = ((HEDGES_Combos['Base_Ln_A'] + HEDGES_Combos['Base_Ln_B'])/2)
 
     # Compute RENTD metric.
-    HEDGES_Combos['A_NetBasis'] = HEDGES_Combos.apply(
-        lambda row: sia_net_basis(gross_basis=row['A_CTD_GROSS_BASIS'],carry=row['A_Carry']), axis=1)
-    HEDGES_Combos['B_NetBasis'] = HEDGES_Combos.apply(
-        lambda row: sia_net_basis(gross_basis=row['B_CTD_GROSS_BASIS'],carry=row['B_Carry']), axis=1)
-
-    HEDGES_Combos["A_NetBasis"]         = pd.to_numeric(HEDGES_Combos["A_NetBasis"], errors="coerce")
-    HEDGES_Combos['A_FUT_MULTIPLIER']   = pd.to_numeric(HEDGES_Combos["A_FUT_MULTIPLIER"], errors="coerce")
-    HEDGES_Combos['A_Q_Value']          = pd.to_numeric(HEDGES_Combos["A_Q_Value"], errors="coerce")
-    HEDGES_Combos['B_NetBasis']         = pd.to_numeric(HEDGES_Combos["B_NetBasis"], errors="coerce")
-    HEDGES_Combos['B_FUT_MULTIPLIER']   = pd.to_numeric(HEDGES_Combos["B_FUT_MULTIPLIER"], errors="coerce")
-    HEDGES_Combos['B_Q_Value']          = pd.to_numeric(HEDGES_Combos["B_Q_Value"], errors="coerce")
-
-    for c in ["A_Q_Value", "B_Q_Value", "A_NetBasis", "B_NetBasis"]:
-        HEDGES_Combos[c] = pd.to_numeric(HEDGES_Combos[c], errors="coerce")
-
     conds = [HEDGES_Combos["B_Q_Value"].eq(-1),
         HEDGES_Combos["A_Q_Value"].eq(-1)]
     choices = [HEDGES_Combos["B_NetBasis"] - HEDGES_Combos["A_NetBasis"],
@@ -173,39 +174,19 @@ def calculate_quantities(HEDGES_Combos):
 
     HEDGES_Combos["PositionNetBasis"] = np.select(conds, choices, default=np.nan)
     HEDGES_Combos['val_vol'] = HEDGES_Combos['PositionNetBasis'] * HEDGES_Combos['Z_Ln_WeightedVol']
-    HEDGES_Combos = HEDGES_Combos.sort_values(by='val_vol', ascending=True)
-
-    unique_rows = (HEDGES_Combos.drop_duplicates(subset=['A_FUT_CONID', 'B_FUT_CONID'], keep='first').copy())
-
-    if len(unique_rows) >= 5:
-        A = unique_rows.iloc[0]
-        B = unique_rows.iloc[1]
-        C = unique_rows.iloc[2]
-
-    else:
-        # Assign defaults or replicate the last row enough times to have 3 rows.
-        default = unique_rows.iloc[0] if len(unique_rows) > 0 else pd.Series(
-            {col: None for col in HEDGES_Combos.columns})
-        A = unique_rows.iloc[0] if len(unique_rows) > 0 else default
-        B = unique_rows.iloc[1] if len(unique_rows) > 1 else default
-        C = unique_rows.iloc[2] if len(unique_rows) > 2 else default
-
-    unique_rows2 = HEDGES_Combos.sort_values(by='val_vol', ascending=False)
-
-    if len(unique_rows2) >= 5:
-        F = unique_rows2.iloc[0]
-        G = unique_rows2.iloc[1]
-        H = unique_rows2.iloc[2]
-
-    else:
-        # Assign defaults or replicate the last row enough times to have 3 rows.
-        default = unique_rows2.iloc[0] if len(unique_rows2) > 0 else pd.Series(
-            {col: None for col in HEDGES_Combos.columns})
-        F = unique_rows2.iloc[0] if len(unique_rows2) > 0 else default
-        G = unique_rows2.iloc[1] if len(unique_rows2) > 1 else default
-        H = unique_rows2.iloc[2] if len(unique_rows2) > 2 else default
-
-    config.ORDERS = pd.DataFrame([A,B,C,F,G,H], columns=HEDGES_Combos.columns)
+    lowest, highest = select_order_candidates(HEDGES_Combos, k=k)
+    config.ORDERS = pd.DataFrame(lowest + highest, columns=HEDGES_Combos.columns)
+    if combos is not None:
+        # Index labels are pair positions: gather the full A_/B_ rows for the picks only.
+        # Empty padding rows (no candidates) have no position and get an all-NaN row of the same schema.
+        labels = config.ORDERS.index
+        picked = labels.notna()
+        full = combos.to_frame(rows=labels[picked].to_numpy(dtype=int)).reset_index(drop=True)
+        full = full.reindex(np.where(picked, np.cumsum(picked) - 1, -1))
+        full.index = labels
+        for col in config.ORDERS.columns:
+            full[col] = config.ORDERS[col].to_numpy()
+        config.ORDERS = full
     config.ORDERS.to_csv('config.ORDERS.csv')
 
     # call risklimits here
@@ -213,6 +194,33 @@ def calculate_quantities(HEDGES_Combos):
     config.updated_ORDERS.to_csv('updated_ORDERS.csv')
     return config.updated_ORDERS
 
+def select_order_candidates(HEDGES_Combos, k=3, by='val_vol', subset=('A_FUT_CONID', 'B_FUT_CONID')):
+    """
+    The k lowest and k highest `by` values over unique `subset` pairs, each pair
+    represented by its own lowest (resp. highest) row. Uses a hashed groupby and
+    np.argpartition, so ranking is O(n) with no sorted copies of the combo set.
+    Returns two lists of k rows, padded with the first pick (or an empty row) when
+    fewer than k candidates exist.
+    """
+    vals = pd.to_numeric(HEDGES_Combos[by], errors='coerce').to_numpy(dtype=float)
+    live = np.flatnonzero(~np.isnan(vals))
+    pair = HEDGES_Combos.iloc[live].groupby(list(subset), sort=False, dropna=False).ngroup().to_numpy()
+    by_pair = pd.Series(vals[live]).groupby(pair)
+    lowest = live[by_pair.idxmin().to_numpy(dtype=int)]
+    highest = live[by_pair.idxmax().to_numpy(dtype=int)]
+    return (_top_k_rows(HEDGES_Combos, lowest, vals[lowest], k),
+            _top_k_rows(HEDGES_Combos, highest, -vals[highest], k))
+
+def _top_k_rows(HEDGES_Combos, positions, keys, k):
+    if len(positions) > k:
+        part = np.argpartition(keys, k - 1)[:k]
+    else:
+        part = np.arange(len(positions))
+    part = part[np.argsort(keys[part], kind='stable')]
+    rows = [HEDGES_Combos.iloc[p] for p in positions[part]]
+    default = rows[0] if rows else pd.Series({col: None for col in HEDGES_Combos.columns}, name=np.nan)
+    return rows + [default] * (k - len(rows))
+
 def optimize_quantities_for_row(row, limit):
     """
     For a given row (i.e. for one hedge pair), find the integer quantities Q_A and Q_B
@@ -221,32 +229,44 @@ def optimize_quantities_for_row(row, limit):
     is maximized while remaining <= limit,
     and such that Q_A/Q_B is as close as possible to the DV01 ratio, r.
     """
-    cost_A = row['A_FUT_MULTIPLIER'] * row['A_FUT_PRICE']
-    cost_B = row['B_FUT_MULTIPLIER'] * row['B_FUT_PRICE']
-    r = row['A_FUT_DV01'] / row['B_FUT_DV01']
-
-    best_q_a = None
-    best_q_b = None
-    best_cost = -1
-    best_error = float('inf')
-    max_q_b = int(limit // cost_B) if cost_B > 0 else 1
-    for q_b in range(1, max_q_b + 1):
-        q_a_candidate = int(round(r * q_b))
-        if q_a_candidate < 1:
-            q_a_candidate = 1
-        cost_candidate = q_a_candidate * cost_A + q_b * cost_B
-        if cost_candidate <= limit:
-            error_candidate = abs((q_a_candidate / q_b) - r)
-            if cost_candidate > best_cost:
-                best_cost = cost_candidate
-                best_q_a = q_a_candidate
-                best_q_b = q_b
-                best_error = error_candidate
-            elif cost_candidate == best_cost and error_candidate < best_error:
-                best_q_a = q_a_candidate
-                best_q_b = q_b
-                best_error = error_candidate
-
-    if best_q_a is None or best_q_b is None:
-        best_q_a, best_q_b = 1, 1
-    return pd.Series({'A_Q_Value': best_q_a, 'B_Q_Value': best_q_b})
+    q_a, q_b = solve_quantities(row['A_FUT_MULTIPLIER'] * row['A_FUT_PRICE'],
+                                row['B_FUT_MULTIPLIER'] * row['B_FUT_PRICE'],
+                                row['A_FUT_DV01'] / row['B_FUT_DV01'], limit)
+    return pd.Series({'A_Q_Value': int(q_a[0]), 'B_Q_Value': int(q_b[0])})
+
+def solve_quantities(cost_A, cost_B, r, limit):
+    """
+    Q_A = max(1, round(r * Q_B)) never decreases as Q_B grows, so with positive
+    contract costs the total cost is strictly increasing in Q_B: the best pair is
+    the largest Q_B whose cost fits under limit (no cost ties, so the DV01 error
+    tie-break never fires). That Q_B is found by a vectorized binary search, which
+    takes O(log(limit / cost_B)) steps per pair instead of one step per contract.
+    Pairs with no feasible Q_B fall back to (1, 1). Inputs broadcast, so one call
+    sizes every candidate pair of a frame.
+    """
+    cost_A = np.atleast_1d(np.asarray(cost_A, dtype=float))
+    cost_B = np.atleast_1d(np.asarray(cost_B, dtype=float))
+    r = np.atleast_1d(np.asarray(r, dtype=float))
+    cost_A, cost_B, r = np.broadcast_arrays(cost_A, cost_B, r)
+
+    def q_a_for(q_b):
+        return np.maximum(np.rint(r * q_b), 1)
+
+    def fits(q_b):
+        return q_a_for(q_b) * cost_A + q_b * cost_B <= limit
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_q_b = np.where(cost_B > 0, np.floor(limit / cost_B), 1)
+    feasible = (max_q_b >= 1) & np.isfinite(r) & fits(np.ones_like(max_q_b))
+    lo = np.ones_like(max_q_b)
+    hi = np.where(feasible, max_q_b, 1)
+    while np.any(lo < hi):
+        mid = np.ceil((lo + hi) / 2)
+        ok = fits(mid)
+        open_ = lo < hi
+        lo = np.where(open_ & ok, mid, lo)
+        hi = np.where(open_ & ~ok, mid - 1, hi)
+
+    q_b = np.where(feasible, lo, 1)
+    q_a = np.where(feasible, q_a_for(q_b), 1)
+    return q_a.astype(np.int64), q_b.astype(np.int64)
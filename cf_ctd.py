@@ -5,7 +5,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from market_data import refresh_market_data
-from fixed_income_calc import BPrice, calculate_ytm
+from fixed_income_calc import BPrice_vec, calculate_ytm
+from dates import attach_day_columns
+from forwards import bond_keys, delivery_dates, forward_matrix, pair_implied_repo
+from functools import lru_cache
 
 # ---------------- Market Data Import and Sorting ----------------
 def refresh_data():
@@ -16,7 +19,10 @@ def normalize_date(date_val):
     """Convert a date value to an 8-digit string (YYYYMMDD)."""
     if pd.isnull(date_val):
         return None
-    date_str = str(date_val).strip()
+    return _normalize_date_str(str(date_val).strip())
+
+@lru_cache(maxsize=65536)
+def _normalize_date_str(date_str):
     match = re.search(r"(\d{8})", date_str)
     if match:
         return match.group(1)
@@ -38,26 +44,25 @@ def convert_dates(df: pd.DataFrame, cols, inplace=True, suffix=None) -> pd.DataF
     return out
 
 # ---------------- Volume Modulation ----------------
+VOLUME_SUFFIXES = {"K": 1_000.0, "M": 1_000_000.0}
+
+def parse_volume(values) -> np.ndarray:
+    """Mixed API volumes ("12.5K", "1M", 300, None) -> float; unparseable entries become NaN."""
+    vol = pd.Series(np.asarray(values, dtype=object))
+    is_str = vol.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    out = pd.to_numeric(vol.where(~is_str), errors="coerce").to_numpy(dtype=float, copy=True)
+    if is_str.any():
+        s = vol[is_str]
+        mult = s.str[-1:].map(VOLUME_SUFFIXES)
+        body = s.where(mult.isna(), s.str[:-1])
+        out[is_str] = pd.to_numeric(body, errors="coerce").to_numpy(dtype=float) * mult.fillna(1.0).to_numpy(dtype=float)
+    return out
+
 def modulate_volume(fut_updated):
     """Convert the api response object of mixed type"""
     df = fut_updated
     logging.info("Processing volume data...")
-    def process_value(val):
-        if isinstance(val, str) and val.endswith('K'):
-            try:
-                return float(val[:-1]) * 1000
-            except ValueError:
-                return float('nan')
-        if isinstance(val, str) and val.endswith('M'):
-            try:
-                return float(val[:-1]) * 1000000
-            except ValueError:
-                return float('nan')
-        try:
-            return float(val)
-        except ValueError:
-            return float('nan')
-    df['volume'] = df['volume'].apply(process_value)
+    df['volume'] = parse_volume(df['volume'].to_numpy(dtype=object))
     return df
 
 def otr_yld(usts: pd.DataFrame) -> pd.DataFrame:
@@ -85,51 +90,72 @@ def otr_yld(usts: pd.DataFrame) -> pd.DataFrame:
     return otr_df
 
 # ---------------- FUTURES -> HEDGES Transformation ----------------
+def _quote_valid(values, nonzero=True):
+    v = pd.Series(np.asarray(values, dtype=object))
+    ok = v.notna().to_numpy(dtype=bool)
+    return ok & (v != 0).to_numpy(dtype=bool) if nonzero else ok
+
+def split_quotes(futures_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per usable quote: a bid and an ask row when both sides are valid (non-null,
+    non-zero), otherwise a last row when last_price is present. Rows whose last_price is a
+    string starting with "c" are skipped. The source index label is kept on every row.
+    """
+    n = len(futures_df)
+    col = lambda c: futures_df[c].to_numpy(dtype=object) if c in futures_df.columns else np.full(n, None, dtype=object)
+    last = col('last_price')
+    closed = pd.Series(last).map(lambda v: isinstance(v, str) and v.lower().startswith("c")).to_numpy(dtype=bool)
+    two_sided = ~closed & _quote_valid(col('bid_price')) & _quote_valid(col('ask_price'))
+    last_only = ~closed & ~two_sided & _quote_valid(last, nonzero=False)
+
+    reps = two_sided * 2 + last_only
+    rows = np.repeat(np.arange(n), reps)
+    out = futures_df.iloc[rows].copy()
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = rows[1:] != rows[:-1]
+    is_bid = two_sided[rows] & first
+    is_ask = two_sided[rows] & ~first
+    yld = col('yield')[rows] if 'yield' in futures_df.columns else np.full(len(rows), np.nan, dtype=object)
+    out['price'] = np.where(is_bid, col('bid_price')[rows], np.where(is_ask, col('ask_price')[rows], last[rows]))
+    out['yield'] = np.where(is_bid, col('bid_yield')[rows], np.where(is_ask, col('ask_yield')[rows], yld))
+    out['src'] = np.where(is_bid, 'bid', np.where(is_ask, 'ask', 'last'))
+    out = out.infer_objects()
+    return out
+
+def _hedges_from_quotes(quotes: pd.DataFrame) -> pd.DataFrame:
+    if 'volume' in quotes.columns:
+        quotes = modulate_volume(quotes)
+    quotes.columns = quotes.columns.astype(str).str.lower().str.strip()
+    return quotes.add_prefix("fut_")
+
 def transform_futures_hedges():
     """ Transform FUTURES into HEDGES. """
-    futures_df = config.FUTURES
-    new_rows = []
-
-    for idx, row in futures_df.iterrows():
-        raw_last = row.get('last_price')
-        if isinstance(raw_last, str) and raw_last.lower().startswith("c"):
-            continue
-
-        bid_dec = row.get('bid_price')
-        bid_y = row.get('bid_yield')
-        ask_dec = row.get('ask_price')
-        ask_y = row.get('ask_yield')
-        last_dec = row.get('last_price')
-        bid_valid = (bid_dec is not None) and (not pd.isna(bid_dec)) and (bid_dec != 0)
-        ask_valid = (ask_dec is not None) and (not pd.isna(ask_dec)) and (ask_dec != 0)
-        last_valid = (last_dec is not None) and (not pd.isna(last_dec))
-
-        if bid_valid and ask_valid:
-            row_bid = row.copy()
-            row_bid['price'] = bid_dec
-            row_bid['yield'] = bid_y
-            row_bid['src'] = 'bid'
-            new_rows.append(row_bid)
-            row_ask = row.copy()
-            row_ask['price'] = ask_dec
-            row_ask['yield'] = ask_y
-            row_ask['src'] = 'ask'
-            new_rows.append(row_ask)
-        elif last_valid:
-            row_single = row.copy()
-            row_single['price'] = last_dec
-            row_single['src'] = 'last'
-            new_rows.append(row_single)
-        else:
-            continue
-
-    hedges_df = pd.DataFrame(new_rows)
-    hedges_df = modulate_volume(hedges_df)  # Reassign HEDGES = df inside modulate_volume
-    hedges_df.columns = hedges_df.columns.astype(str).str.lower().str.strip()
-    hedges_df = hedges_df.add_prefix("fut_")
+    hedges_df = _hedges_from_quotes(split_quotes(config.FUTURES))
     logging.info("Transformed FUTURES into HEDGES with %d rows.", len(hedges_df))
     return hedges_df
 
+def patch_hedges(HEDGES: pd.DataFrame, updates: pd.DataFrame, futures: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Streaming mode: apply quote updates (rows indexed like config.FUTURES, any subset of its
+    columns) to FUTURES and rebuild only the HEDGES rows of the touched contracts. Untouched
+    rows are kept as they are, including their CTD columns; rebuilt rows carry only fut_*
+    columns until ctd_pairing runs on them. Row order follows FUTURES.
+    """
+    futures = config.FUTURES if futures is None else futures
+    labels = updates.index.unique()
+    new = labels.difference(futures.index)
+    if len(new):
+        futures = pd.concat([futures, updates.loc[new].reindex(columns=futures.columns)])
+    cols = [c for c in updates.columns if c in futures.columns]
+    futures.loc[labels, cols] = updates.loc[~updates.index.duplicated(keep="last"), cols].reindex(labels).to_numpy()
+    config.FUTURES = futures
+
+    fresh = _hedges_from_quotes(split_quotes(futures.loc[labels]))
+    kept = HEDGES[~HEDGES.index.isin(labels)]
+    out = pd.concat([kept, fresh])
+    order = np.argsort(futures.index.get_indexer(out.index), kind="stable")
+    return out.iloc[order]
+
 def avg_ust_by_conid(df: pd.DataFrame | None = None) -> pd.DataFrame:
     TARGET_COLS = ["bid_yield", "ask_yield", "yield", "ask_price", "bid_price", "price"]
 
@@ -167,6 +193,19 @@ def safe_datetime(val):
     except Exception:
         return None
 
+def quote_yields(df: pd.DataFrame, price_cols, cpn_col="coupon", term_col="years_to_maturity", suffix="_ytm"):
+    """Clean quotes -> yields for every column in price_cols with a single calculate_ytm call."""
+    price_cols = [c for c in price_cols if c in df.columns]
+    if not price_cols:
+        return df
+    prices = np.column_stack([pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float) for c in price_cols])
+    cpn = pd.to_numeric(df[cpn_col], errors="coerce").to_numpy(dtype=float)[:, None]
+    term = pd.to_numeric(df[term_col], errors="coerce").to_numpy(dtype=float)[:, None]
+    ytm = calculate_ytm(prices, cpn, term)
+    for k, c in enumerate(price_cols):
+        df[f"{c}{suffix}"] = ytm[:, k]
+    return df
+
 # ---------- IRR-based Fair Value Derivation for CTD Baskets ----------------
 def fair_value_derivation():
     implied = avg_ust_by_conid(config.ust_hist_y)
@@ -180,89 +219,150 @@ def fair_value_derivation():
         print(f"-> {implied[col].isna().sum()} missing in {col}")
     implied = implied.dropna(subset=required_cols)
     implied['yield'] = implied['yield']/100
-    settle_date = datetime.today().strftime('%Y%m%d')
-    implied['BPrice'] = implied.apply(lambda row: BPrice(cpn=row['coupon'],term=row['years_to_maturity'],yield_=row['yield'],
-        period=2,begin=row['prev_coupon'],settle=settle_date,next_coupon=row['next_coupon'],day_count=1), axis=1)
+    implied = quote_yields(implied, ["bid_price", "ask_price", "price"])
+    implied = attach_day_columns(implied, cols)
+    settle_date = np.datetime64(datetime.today().date(), 'D')
+    implied['BPrice'] = BPrice_vec(cpn=implied['coupon'],term=implied['years_to_maturity'],yield_=implied['yield'],
+        period=2,begin=implied['prev_coupon_D'],settle=settle_date,next_coupon=implied['next_coupon_D'],day_count=1)
     implied = implied.drop(columns=["87_raw", "6508","increment_lower_edge", "strike", "avg_price"], errors="ignore")
     return implied
 
 # ---------- CTD Pairing ----------------
-def ctd_pairing(HEDGES, implied):
+# HEDGES column <- deliverable column carried over from the selected CTD.
+CTD_FIELDS = {
+    'ctd_BPrice': 'BPrice', 'ctd_gross_basis': 'Gross_Basis', 'ctd_irr': 'IRR', 'ctd_ytm': 'YTM',
+    'ctd_cusip': 'cusip_y', 'ctd_conid': 'conid', 'ctd_price': 'price', 'ctd_yield': 'yield',
+    'ctd_coupon_rate': 'coupon', 'ctd_maturity_date': 'maturity_date', 'ctd_cf': 'conversion_factor',
+    'ctd_prev_coupon': 'prev_coupon', 'ctd_next_coupon': 'next_coupon',
+    'ctd_prev_coupon_D': 'prev_coupon_D', 'ctd_next_coupon_D': 'next_coupon_D',
+}
+
+# Deliverable windows per contract prefix: years-to-maturity offsets from futures expiry
+# and the original maturity cap of the basket.
+DELIVERABLE_WINDOWS = pd.DataFrame([
+    ("ZQ", 0.00, 30 / 360, np.inf),
+    ("ZT", 1.72, 2.03, 5.28),
+    ("Z3", 2.72, 3.03, 7.03),
+    ("ZF", 4.16, 5.28, 5.27),
+    ("ZN", 6.47, 8.03, 10.03),
+    ("TN", 9.47, 10.03, 10.03),
+], columns=["prefix", "lower", "upper", "max_origin"]).set_index("prefix")
+
+def deliverable_windows(HEDGES, windows=DELIVERABLE_WINDOWS):
+    """Deliverable range [lower, upper] (years to maturity) and original maturity cap for every future."""
+    spec = windows.reindex(HEDGES["fut_ticker"].astype(str).str[:2].to_numpy())
+    expiry = pd.to_numeric(HEDGES["fut_year_to_maturity"], errors="coerce").to_numpy(dtype=float)
+    lower = expiry + spec["lower"].to_numpy(dtype=float)
+    upper = expiry + spec["upper"].to_numpy(dtype=float)
+    return lower, upper, spec["max_origin"].to_numpy(dtype=float)
+
+def build_deliverable_index(implied, windows=DELIVERABLE_WINDOWS):
+    """
+    Deliverable universe sorted by years to maturity, one bucket per original maturity
+    cap in `windows`. Each bucket is (sorted years_to_maturity, row positions in implied)
+    so a basket is two searchsorted calls instead of a scan of the whole frame.
+    """
+    ytm = pd.to_numeric(implied["years_to_maturity"], errors="coerce").to_numpy(dtype=float)
+    origin = pd.to_numeric(implied["original_maturity"], errors="coerce").to_numpy(dtype=float)
+    index = {}
+    for cap in np.unique(windows["max_origin"].to_numpy(dtype=float)):
+        rows = np.flatnonzero((origin <= cap) & ~np.isnan(ytm))
+        rows = rows[np.argsort(ytm[rows], kind="stable")]
+        index[cap] = (ytm[rows], rows)
+    return index
+
+def basket_ranges(index, cap, lower, upper):
+    """[start, stop) into the cap bucket for each window; O(log n) per future."""
+    sorted_ytm, _ = index[cap]
+    return np.searchsorted(sorted_ytm, lower, side="left"), np.searchsorted(sorted_ytm, upper, side="right")
+
+def ctd_candidates(HEDGES, implied, index=None, windows=DELIVERABLE_WINDOWS):
+    """
+    Every (future, deliverable) pair inside the future's window, as positional index
+    arrays into HEDGES and implied, with gross basis and IRR evaluated in one pass.
+    """
+    if index is None:
+        index = build_deliverable_index(implied, windows)
+    lower, upper, max_origin = deliverable_windows(HEDGES, windows)
+    fut_price = pd.to_numeric(HEDGES["fut_price"], errors="coerce").to_numpy(dtype=float)
+    ytm = pd.to_numeric(implied["years_to_maturity"], errors="coerce").to_numpy(dtype=float)
+    cf = pd.to_numeric(implied["conversion_factor"], errors="coerce").to_numpy(dtype=float)
+    bprice = pd.to_numeric(implied["BPrice"], errors="coerce").to_numpy(dtype=float)
+
+    fi_parts, bi_parts = [], []
+    live = ~np.isnan(fut_price) & ~np.isnan(lower)
+    for cap in np.unique(max_origin[live]):
+        futs = np.flatnonzero(live & (max_origin == cap))
+        start, stop = basket_ranges(index, cap, lower[futs], upper[futs])
+        counts = np.maximum(stop - start, 0)
+        # Ragged arange: positions start[k] .. stop[k]-1 for every future k.
+        offsets = np.repeat(start - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        fi_parts.append(np.repeat(futs, counts))
+        bi_parts.append(index[cap][1][offsets])
+    fi = np.concatenate(fi_parts) if fi_parts else np.array([], dtype=int)
+    bi = np.concatenate(bi_parts) if bi_parts else np.array([], dtype=int)
+
+    gross_basis = (fut_price[fi] * cf[bi]) - bprice[bi]
+    irr = (gross_basis / bprice[bi] - 1) * (ytm[bi] * 365) / 365
+    return fi, bi, gross_basis, irr
+
+def select_ctd(HEDGES, implied, index=None):
+    """Lowest-IRR deliverable per future via a grouped argmin; indexed by HEDGES row position."""
+    fi, bi, gross_basis, irr = ctd_candidates(HEDGES, implied, index)
+    priced = ~np.isnan(irr)
+    fi, bi, gross_basis, irr = fi[priced], bi[priced], gross_basis[priced], irr[priced]
+
+    order = np.lexsort((irr, fi))
+    first = order[np.unique(fi[order], return_index=True)[1]]
+
+    selected = implied.iloc[bi[first]].reset_index(drop=True)
+    selected["Gross_Basis"] = gross_basis[first]
+    selected["IRR"] = irr[first]
+    selected["YTM"] = pd.to_numeric(selected["years_to_maturity"], errors="coerce")
+    selected["implied_pos"] = bi[first]
+    selected.index = fi[first]
+    return selected
+
+def scatter_positions(df, col, pos, values):
+    """Write values into df[col] at row positions (HEDGES can carry duplicate labels from bid/ask rows)."""
+    out = df[col].to_numpy(dtype=object, copy=True) if col in df else np.full(len(df), np.nan, dtype=object)
+    out[pos] = values
+    df[col] = pd.Series(out, index=df.index).infer_objects()
+
+def forward_fields(HEDGES, selected, forwards):
+    """Forward clean price, forward carry and net basis of each selected CTD at its future's delivery date."""
+    pos = selected.index.to_numpy()
+    delivery = delivery_dates(HEDGES)[pos]
+    rows, cols = forwards.positions(bond_keys(selected), delivery)
+    fut_price = pd.to_numeric(HEDGES["fut_price"], errors="coerce").to_numpy(dtype=float)[pos]
+    cf = pd.to_numeric(selected["conversion_factor"], errors="coerce").to_numpy(dtype=float)
+    return {"ctd_fwd_clean": forwards.take("fwd_clean", rows, cols),
+            "ctd_fwd_carry": forwards.take("carry", rows, cols),
+            "ctd_net_basis": forwards.net_basis(fut_price, cf, rows, cols)}
+
+def ctd_pairing(HEDGES, implied, index=None, forwards=None):
     print("Starting CTD pairing")
-    today = pd.to_datetime(datetime.now())
-
-    for idx, fut in HEDGES.iterrows():
-        symbol = fut.get("fut_ticker", "")[:2]
-        sym_full = fut.get("fut_ticker", "")
-        expiry = float(fut.get("fut_year_to_maturity", np.nan))
-        fut_price = float(fut.get("fut_price", np.nan))
-        print(f"\n-> Processing row {idx}: symbol={sym_full}, expiry={expiry}, Fwd Mkt Price={fut_price}")
-
-        if pd.isna(expiry) or pd.isna(fut_price):
-            continue
-
-        # Determine deliverable window and original maturity cap
-        if symbol == "ZQ":
-            lower = expiry
-            upper = lower + (30 / 360)
-            max_origin = np.inf
-        elif symbol == "ZT":
-            lower = expiry + 1.72
-            upper = expiry + 2.03
-            max_origin = 5.28
-        elif symbol == "Z3":
-            lower = expiry + 2.72
-            upper = expiry + 3.03
-            max_origin = 7.03
-        elif symbol == "ZF":
-            lower = expiry + 4.16
-            upper = expiry + 5.28
-            max_origin = 5.27
-        elif symbol == "ZN":
-            lower = expiry + 6.47
-            upper = expiry + 8.03
-            max_origin = 10.03
-        elif symbol == "TN":
-            lower = expiry + 9.47
-            upper = expiry + 10.03
-            max_origin = 10.03
-        else:
-            print(f"Unknown prefix for symbol '{sym_full}' — skipping")
-            continue
-
-        print(f"-> Deliverable range: {lower:.2f} to {upper:.2f}, max_origin: {max_origin}")
-        (implied["original_maturity"].astype(float) <= max_origin)
-        candidates = implied[(implied["years_to_maturity"] >= lower) &(implied["years_to_maturity"] <= upper) &
-                             (pd.to_numeric(implied["original_maturity"], errors="coerce") <= max_origin)].copy()
-
-        print(f"-> {len(candidates)} candidates after filter for {symbol}")
-        candidates = candidates
-        if candidates.empty or "BPrice" not in candidates or candidates["BPrice"].isna().all():
-            print("Candidates missing price column or all prices are NaN")
-            continue
-
-        candidates["Gross_Basis"] = (fut_price * candidates["conversion_factor"]) - candidates["BPrice"]
-        candidates["IRR"] = (((fut_price * candidates["conversion_factor"]) - candidates["BPrice"])/candidates["BPrice"] - 1) * (candidates["years_to_maturity"] * 365)/365
-        candidates["YTM"] = candidates["years_to_maturity"]
-
-        selected = candidates.sort_values("IRR", ascending=True).iloc[0]
-        HEDGES.at[idx, 'ctd_BPrice'] = selected.get('BPrice')
-        HEDGES.at[idx, 'ctd_gross_basis'] = selected.get('Gross_Basis')
-        HEDGES.at[idx, 'ctd_irr'] = selected.get('IRR')
-        HEDGES.at[idx, 'ctd_ytm'] = selected.get('YTM')
-        HEDGES.at[idx, 'carry'] = HEDGES.at[idx, 'ctd_gross_basis'] - HEDGES.at[idx, 'ctd_BPrice'] * HEDGES.at[idx, 'ctd_irr'] * (HEDGES.at[idx, 'ctd_ytm']*365//365) /365
-        HEDGES.at[idx, 'ctd_cusip'] = selected.get('cusip_y')
-        HEDGES.at[idx, 'ctd_conid'] = selected.get('conid')
-        HEDGES.at[idx, 'ctd_price'] = selected.get('price')
-        HEDGES.at[idx, 'ctd_yield'] = selected.get('yield')
-        HEDGES.at[idx, 'ctd_gross_basis'] = selected.get('Gross_Basis')
-        HEDGES.at[idx, 'ctd_irr'] = selected.get('IRR')
-        HEDGES.at[idx, 'ctd_coupon_rate'] = selected.get('coupon')
-        HEDGES.at[idx, 'ctd_maturity_date'] = selected.get('maturity_date')
-        HEDGES.at[idx, 'ctd_cf'] = selected.get('conversion_factor')
-        HEDGES.at[idx, 'ctd_prev_coupon'] = selected.get('prev_coupon')
-        HEDGES.at[idx, 'ctd_next_coupon'] = selected.get('next_coupon')
-        print(f"{sym_full} CTD conid: {selected['conid']}, IRR: {selected['IRR']}, Gross Basis: {selected['Gross_Basis']}")
+    if "BPrice" not in implied:
+        print("Candidates missing price column")
+        return HEDGES
+
+    selected = select_ctd(HEDGES, implied, index)
+    skipped = len(HEDGES) - len(selected)
+    if skipped:
+        print(f"-> {skipped} futures without a priced deliverable (unknown prefix, missing expiry/price or empty basket)")
+
+    pos = selected.index.to_numpy()
+    for dst, src in CTD_FIELDS.items():
+        scatter_positions(HEDGES, dst, pos, selected[src].to_numpy() if src in selected else None)
+    carry = (selected["Gross_Basis"] - selected["BPrice"] * selected["IRR"] * (selected["YTM"] * 365 // 365) / 365)
+    scatter_positions(HEDGES, 'carry', pos, carry.to_numpy())
+    # exact implied repo to the delivery date, with intervening coupons reinvested
+    scatter_positions(HEDGES, 'ctd_implied_repo', pos, pair_implied_repo(HEDGES, implied, pos, selected["implied_pos"].to_numpy()))
+    if forwards is not None:   # forward_matrix(implied, delivery_dates(HEDGES)) from forwards.py
+        for dst, values in forward_fields(HEDGES, selected, forwards).items():
+            scatter_positions(HEDGES, dst, pos, values)
+    for sym_full, sel in zip(HEDGES["fut_ticker"].to_numpy()[pos], selected.itertuples(index=False)):
+        print(f"{sym_full} CTD conid: {getattr(sel, 'conid', None)}, IRR: {sel.IRR}, Gross Basis: {sel.Gross_Basis}")
 
     print("CTD pairing complete")
     HEDGES.to_csv("HEDGES.csv", index=False)
@@ -276,7 +376,8 @@ def cf_ctd_main():
     refresh_data()
     HEDGES = transform_futures_hedges()
     implied = fair_value_derivation()
-    HEDGES = ctd_pairing(HEDGES, implied)
+    forwards = forward_matrix(implied, delivery_dates(HEDGES))
+    HEDGES = ctd_pairing(HEDGES, implied, forwards=forwards)
     return HEDGES
 
 if __name__ == "__main__":
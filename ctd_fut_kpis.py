@@ -2,13 +2,12 @@
 CTD and FUT KPIs
 """
 
-import itertools
+import numpy as np
 import pandas as pd
 import datetime
 from config import HEDGES
-from fixed_income_calc import BPrice,MDur,MacDur,Cvx,DV01,fut_DV01,fut_DV10,fut_DV50,fut_DV100, \
-    fut_DV01minus,fut_DV10minus,fut_DV50minus,fut_DV100minus,fut_sensitivity22,fut_sensitivity22minus, \
-    fut_sensitivity55,fut_sensitivity55minus,TPrice,fut_Cvx
+from dates import day_column
+from fixed_income_calc import risk_bundle, DEFAULT_SHOCK_GRID
 
 def display_hedges_info():
     print("Displaying first 5 rows of HEDGES dataframe:")
@@ -19,207 +18,118 @@ def run_fixed_income_calculation(HEDGES):
 
     period = 2
     day_count = 1
-    today = datetime.today()
-    formatted = today.strftime("%m%d%y")
-
-    HEDGES['CTD_BPRICE'] = HEDGES.apply(lambda row: BPrice(cpn=row['CTD_COUPON'],
-                           term=row['CTD_YTM'],
-                           yield_=row['CTD_YIELD'],
-                           period=period,
-                           begin=row['CTD_PREV_COUPON'],
-                           settle=formatted,
-                           next_coupon=row['CTD_NEXT_COUPON'],
-                           day_count=day_count), axis=1)
-
-    HEDGES['FUT_TPRICE'] = HEDGES.apply(lambda row: TPrice(cpn=row['CTD_COUPON'],
-                                                           term=row['CTD_YTM'],
-                                                           yield_=row['CTD_YIELD'],
-                                                           period=period,
-                                                           begin=row['CTD_PREV_COUPON'],
-                                                           settle=formatted,
-                                                           next_coupon=row['CTD_NEXT_COUPON'],
-                                                           day_count=day_count,
-                                                           conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['CTD_MDUR'] = HEDGES.apply(lambda row: MDur(cpn=row['CTD_COUPON'],
-                         term=row['CTD_YTM'],
-                         yield_=row['CTD_YIELD'],
-                         period=period,
-                         begin=row['CTD_PREV_COUPON'],
-                         settle=formatted,
-                         next_coupon=row['CTD_NEXT_COUPON'],
-                         day_count=day_count), axis=1)
-
-    HEDGES['CTD_MACDUR'] = HEDGES.apply(lambda row: MacDur(cpn=row['CTD_COUPON'],
-                           term=row['CTD_YTM'],
-                           yield_=row['CTD_YIELD'],
-                           period=period,
-                           begin=row['CTD_PREV_COUPON'],
-                           settle=formatted,
-                           next_coupon=row['CTD_NEXT_COUPON'],
-                           day_count=day_count), axis=1)
-
-    HEDGES['CTD_CVX'] = HEDGES.apply(lambda row: Cvx(cpn=row['CTD_COUPON'],
-                                                     term=row['CTD_YTM'],
-                                                     yield_=row['CTD_YIELD'],
-                                                     period=period,
-                                                     begin=row['CTD_PREV_COUPON'],
-                                                     settle=formatted,
-                                                     next_coupon=row['CTD_NEXT_COUPON'],
-                                                     day_count=day_count,), axis=1)
-
-    HEDGES['FUT_CVX'] = HEDGES.apply(lambda row: fut_Cvx(cpn=row['CTD_COUPON'],
-                                                     term=row['CTD_YTM'],
-                                                     yield_=row['CTD_YIELD'],
-                                                     period=period,
-                                                     begin=row['CTD_PREV_COUPON'],
-                                                     settle=formatted,
-                                                     next_coupon=row['CTD_NEXT_COUPON'],
-                                                     day_count=day_count,
-                                                     conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['CTD_DV01'] = HEDGES.apply(lambda row: DV01(cpn=row['CTD_COUPON'],
-                                                           term=row['CTD_YTM'],
-                                                           yield_=row['CTD_YIELD'],
-                                                           period=period,
-                                                           begin=row['CTD_PREV_COUPON'],
-                                                           settle=formatted,
-                                                           next_coupon=row['CTD_NEXT_COUPON'],
-                                                           day_count=day_count,
-                                                           conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['FUT_DV01'] = HEDGES.apply(lambda row: fut_DV01(cpn=row['CTD_COUPON'],
-                         term=row['CTD_YTM'],
-                         yield_=row['CTD_YIELD'],
-                         period=period,
-                         begin=row['CTD_PREV_COUPON'],
-                         settle=formatted,
-                         next_coupon=row['CTD_NEXT_COUPON'],
-                         day_count=day_count,
-                         conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['FUT_DV01_MINUS'] = HEDGES.apply(lambda row: fut_DV01minus(cpn=row['CTD_COUPON'],
-                                                       term=row['CTD_YTM'],
-                                                       yield_=row['CTD_YIELD'],
-                                                       period=period,
-                                                       begin=row['CTD_PREV_COUPON'],
-                                                       settle=formatted,
-                                                       next_coupon=row['CTD_NEXT_COUPON'],
-                                                       day_count=day_count,
-                                                       conv_factor=row["CTD_CF"]), axis=1)
-
-
-    HEDGES['FUT_DV10'] = HEDGES.apply(lambda row: fut_DV10(cpn=row['CTD_COUPON'],
-                         term=row['CTD_YTM'],
-                         yield_=row['CTD_YIELD'],
-                         period=period,
-                         begin=row['CTD_PREV_COUPON'],
-                         settle=formatted,
-                         next_coupon=row['CTD_NEXT_COUPON'],
-                         day_count=day_count,
-                         conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['FUT_DV10_MINUS'] = HEDGES.apply(lambda row: fut_DV10minus(cpn=row['CTD_COUPON'],
-                         term=row['CTD_YTM'],
-                         yield_=row['CTD_YIELD'],
-                         period=period,
-                         begin=row['CTD_PREV_COUPON'],
-                         settle=formatted,
-                         next_coupon=row['CTD_NEXT_COUPON'],
-                         day_count=day_count,
-                         conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['FUT_DV50'] = HEDGES.apply(lambda row: fut_DV50(cpn=row['CTD_COUPON'],
-                         term=row['CTD_YTM'],
-                         yield_=row['CTD_YIELD'],
-                         period=period,
-                         begin=row['CTD_PREV_COUPON'],
-                         settle=formatted,
-                         next_coupon=row['CTD_NEXT_COUPON'],
-                         day_count=day_count,
-                         conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['FUT_DV50_MINUS'] = HEDGES.apply(lambda row: fut_DV50minus(cpn=row['CTD_COUPON'],
-                         term=row['CTD_YTM'],
-                         yield_=row['CTD_YIELD'],
-                         period=period,
-                         begin=row['CTD_PREV_COUPON'],
-                         settle=formatted,
-                         next_coupon=row['CTD_NEXT_COUPON'],
-                         day_count=day_count,
-                         conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['FUT_DV100'] = HEDGES.apply(lambda row: fut_DV100(cpn=row['CTD_COUPON'],
-                         term=row['CTD_YTM'],
-                         yield_=row['CTD_YIELD'],
-                         period=period,
-                         begin=row['CTD_PREV_COUPON'],
-                         settle=formatted,
-                         next_coupon=row['CTD_NEXT_COUPON'],
-                         day_count=day_count,
-                         conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['FUT_DV100_MINUS'] = HEDGES.apply(lambda row: fut_DV100minus(cpn=row['CTD_COUPON'],
-                         term=row['CTD_YTM'],
-                         yield_=row['CTD_YIELD'],
-                         period=period,
-                         begin=row['CTD_PREV_COUPON'],
-                         settle=formatted,
-                         next_coupon=row['CTD_NEXT_COUPON'],
-                         day_count=day_count,
-                         conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['FUT_DV22'] = HEDGES.apply(lambda row: fut_sensitivity22(cpn=row['CTD_COUPON'],
-                          term=row['CTD_YTM'],
-                          yield_=row['CTD_YIELD'],
-                          period=period,
-                          begin=row['CTD_PREV_COUPON'],
-                          settle=formatted,
-                          next_coupon=row['CTD_NEXT_COUPON'],
-                          day_count=day_count,
-                          conv_factor=row["CTD_CF"]), axis=1)
-
-    HEDGES['FUT_DV22_MINUS'] = HEDGES.apply(lambda row: fut_sensitivity22minus(cpn=row['CTD_COUPON'],
-                          term=row['CTD_YTM'],
-                          yield_=row['CTD_YIELD'],
-                          period=period,
-                          begin=row['CTD_PREV_COUPON'],
-                          settle=formatted,
-                          next_coupon=row['CTD_NEXT_COUPON'],
-                          day_count=day_count,
-                          conv_factor=row["CTD_CF"]), axis=1)
-
-    # Generate all combinations of distinct HEDGES rows (based on CTD_CONID).
-    combinations = [(row1, row2) for row1, row2 in itertools.product(HEDGES.iterrows(), repeat=2)
-                    if row1[1]['CTD_CONID'] != row2[1]['CTD_CONID']]
-
-    combos_data = []
-    for combo in combinations:
-        row1, row2 = combo
-        # Prefix the headers of row1 with 'A_' and row2 with 'B_'
-        row1_data = {f'A_{key}': value for key, value in row1[1].to_dict().items()}
-        row2_data = {f'B_{key}': value for key, value in row2[1].to_dict().items()}
-        combined_row = {**row1_data, **row2_data}
-        combos_data.append(combined_row)
+    today = datetime.date.today()
+    settle = np.datetime64(today, 'D')
+
+    # One engine call prices the CTD once and derives every sensitivity column from it.
+    cpn = pd.to_numeric(HEDGES['CTD_COUPON'], errors='coerce')
+    term = pd.to_numeric(HEDGES['CTD_YTM'], errors='coerce')
+    yld = pd.to_numeric(HEDGES['CTD_YIELD'], errors='coerce')
+    cf = pd.to_numeric(HEDGES['CTD_CF'], errors='coerce')
+    # Coupon dates arrive as day numbers (CTD_*_COUPON_D) from ctd_pairing; strings are parsed only as a fallback.
+    bundle = risk_bundle(cpn, term, yld, period=period, begin=day_column(HEDGES, 'CTD_PREV_COUPON'), settle=settle,
+                         next_coupon=day_column(HEDGES, 'CTD_NEXT_COUPON'), day_count=day_count,
+                         conv_factor=cf, shocks=DEFAULT_SHOCK_GRID)
+
+    HEDGES['CTD_BPRICE'] = bundle['BPRICE']
+    HEDGES['FUT_TPRICE'] = bundle['TPRICE']
+    HEDGES['CTD_MDUR'] = bundle['MDUR']
+    HEDGES['CTD_MACDUR'] = bundle['MACDUR']
+    HEDGES['CTD_CVX'] = bundle['CVX']
+    HEDGES['FUT_CVX'] = bundle['FUT_CVX']
+    HEDGES['CTD_DV01'] = bundle['DV01']
+    HEDGES['FUT_DV01'] = bundle['FUT_DV01']
+    for name, _, _ in DEFAULT_SHOCK_GRID:
+        HEDGES[f'FUT_{name}'] = bundle[f'FUT_{name}']
 
     ## dollar roll SP and CBOT front tenor combinations (back mo deferred by 31-96 days).
-    HEDGES_Combos = pd.DataFrame(combos_data)
-    # Keep under 96 days defer (B later than A)
-    a = pd.to_numeric(HEDGES_Combos['A_FUT_YEAR_TO_MATURITY'], errors='coerce')
-    b = pd.to_numeric(HEDGES_Combos['B_FUT_YEAR_TO_MATURITY'], errors='coerce')
-
-    HEDGES_Combos = HEDGES_Combos.loc[a.notna() & b.notna()].copy()
-    a = a.loc[HEDGES_Combos.index]
-    b = b.loc[HEDGES_Combos.index]
+    a_pos, b_pos = hedge_pair_positions(HEDGES)
+    HEDGES_Combos = HedgeCombos(HEDGES, a_pos, b_pos)
+    return HEDGES_Combos
 
-    max_days = 96
-    days_in_year = 360  # keep Act/360 to be consistent with your prior code
+def hedge_pair_positions(HEDGES, max_days=96, days_in_year=360):
+    """
+    Row positions (A, B) of every ordered HEDGES pair with distinct CTD_CONID where B
+    expires 0 to max_days after A (Act/360, as before). Rows are sorted by
+    FUT_YEAR_TO_MATURITY and each A only scans the B rows inside its calendar
+    window, so work scales with the number of valid pairs rather than n^2.
+    """
     max_years = max_days / days_in_year
-
-    diff = b - a
-    mask = (diff >= 0) & (diff < max_years)
-    HEDGES_Combos = HEDGES_Combos.loc[mask].copy()
-    return HEDGES_Combos
+    ytm = pd.to_numeric(HEDGES['FUT_YEAR_TO_MATURITY'], errors='coerce').to_numpy(dtype=float)
+    conid = HEDGES['CTD_CONID'].to_numpy()
+
+    valid = np.flatnonzero(~np.isnan(ytm))
+    order = valid[np.argsort(ytm[valid], kind='stable')]
+    sorted_ytm = ytm[order]
+    start = np.searchsorted(sorted_ytm, sorted_ytm, side='left')
+    stop = np.searchsorted(sorted_ytm, sorted_ytm + max_years, side='right')
+    counts = stop - start
+    a = np.repeat(order, counts)
+    b = order[np.repeat(start - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+
+    # Exact window test on the (few) emitted pairs, same expression as the old filter.
+    diff = ytm[b] - ytm[a]
+    keep = (diff >= 0) & (diff < max_years) & (conid[a] != conid[b])
+    a, b = a[keep], b[keep]
+    pair_order = np.lexsort((b, a))
+    return a[pair_order], b[pair_order]
+
+class _Leg:
+    """One side of HedgeCombos: leg['CTD_IRR'] gathers that HEDGES column for every pair."""
+    def __init__(self, hedges, pos):
+        self.hedges = hedges
+        self.pos = pos
+
+    def __getitem__(self, col):
+        return pd.Series(self.hedges[col].to_numpy()[self.pos], name=col)
+
+class HedgeCombos:
+    """
+    HEDGES pairs kept as two int32 row-position arrays into a single HEDGES table.
+    Columns are gathered on demand: combos.A['CTD_IRR'], combos.B['FUT_PRICE'], or
+    combos['A_CTD_IRR'] with the prefixed names used downstream. to_frame()
+    materializes the wide A_/B_ layout for just the columns and pairs asked for.
+    """
+    def __init__(self, hedges, a_pos, b_pos):
+        self.hedges = hedges
+        self.a_pos = np.asarray(a_pos, dtype=np.int32)
+        self.b_pos = np.asarray(b_pos, dtype=np.int32)
+        self.A = _Leg(hedges, self.a_pos)
+        self.B = _Leg(hedges, self.b_pos)
+
+    def __len__(self):
+        return len(self.a_pos)
+
+    @property
+    def columns(self):
+        return pd.Index([f'A_{c}' for c in self.hedges.columns] + [f'B_{c}' for c in self.hedges.columns])
+
+    @property
+    def shape(self):
+        return len(self), 2 * self.hedges.shape[1]
+
+    def __getitem__(self, name):
+        leg, col = name.split('_', 1)
+        series = {'A': self.A, 'B': self.B}[leg][col]
+        series.name = name
+        return series
+
+    def take(self, rows):
+        rows = np.asarray(rows)
+        return HedgeCombos(self.hedges, self.a_pos[rows], self.b_pos[rows])
+
+    def to_frame(self, columns=None, rows=None):
+        """
+        Wide A_/B_ frame. `columns` are HEDGES column names (both legs are emitted);
+        `rows` are pair positions. The frame index is the pair position.
+        """
+        cols = list(self.hedges.columns) if columns is None else list(columns)
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+        hedges = self.hedges[cols]
+        a = hedges.iloc[self.a_pos[rows]].add_prefix('A_')
+        b = hedges.iloc[self.b_pos[rows]].add_prefix('B_')
+        a.index = b.index = rows
+        return pd.concat([a, b], axis=1)
 
 if __name__ == "__main__":
     display_hedges_info()
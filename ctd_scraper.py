@@ -3,21 +3,109 @@ scraper.py
 """
 import os
 import re
+import json
 import time
+import hashlib
 import config
 import requests
 import pandas as pd
 from datetime import datetime
+from urllib.parse import urlsplit
 from zeroes import derive_cf
 
+BASE_URL = "https://www.cmegroup.com/trading/interest-rates/treasury-conversion-factors.html"
+CACHE_DIR = os.path.join(os.getcwd(), ".cme_cache")
+
+# ────────────────────────────────────────────────────────────────────────────────
+#   Transports: anything with get(url, headers, timeout) -> (status, body, headers)
+# ────────────────────────────────────────────────────────────────────────────────
+class HttpTransport:
+    """Pooled requests.Session; 304 responses come back with an empty body."""
+    def __init__(self, session=None):
+        if session is None:
+            session = requests.Session()
+            session.headers["User-Agent"] = "Mozilla/5.0"
+        self.session = session
+
+    def get(self, url, headers=None, timeout=15):
+        r = self.session.get(url, headers=headers or {}, timeout=timeout)
+        if r.status_code != 304:
+            r.raise_for_status()
+        return r.status_code, r.content, dict(r.headers)
+
+class LocalTransport:
+    """Serves URLs from a directory by file name (query string ignored), honouring the conditional headers."""
+    def __init__(self, root):
+        self.root = root
+
+    def get(self, url, headers=None, timeout=None):
+        path = os.path.join(self.root, os.path.basename(urlsplit(url).path))
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{url} not found under {self.root}")
+        with open(path, "rb") as f:
+            body = f.read()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        resp_headers = {"ETag": etag, "Last-Modified": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(os.path.getmtime(path)))}
+        if (headers or {}).get("If-None-Match") == etag:
+            return 304, b"", resp_headers
+        return 200, body, resp_headers
+
+# ────────────────────────────────────────────────────────────────────────────────
+#   On-disk cache of bodies + validators
+# ────────────────────────────────────────────────────────────────────────────────
+def _load_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_meta(cache_dir, meta):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = os.path.join(cache_dir, "meta.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, os.path.join(cache_dir, "meta.json"))
+
+def conditional_get(transport, url, name, cache_dir=CACHE_DIR, timeout=15):
+    """
+    GET `url` with If-None-Match / If-Modified-Since from the last response cached under
+    `name`. Returns (body, changed); on 304 the cached body is returned unchanged.
+    """
+    meta = _load_meta(cache_dir)
+    entry = meta.get(name, {})
+    body_path = os.path.join(cache_dir, name)
+    headers = {}
+    if os.path.exists(body_path):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    status, body, resp_headers = transport.get(url, headers=headers, timeout=timeout)
+    if status == 304:
+        with open(body_path, "rb") as f:
+            return f.read(), False
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(body_path, "wb") as f:
+        f.write(body)
+    meta = _load_meta(cache_dir)
+    meta[name] = {"url": url, "etag": resp_headers.get("ETag"), "last_modified": resp_headers.get("Last-Modified")}
+    _save_meta(cache_dir, meta)
+    return body, True
+
 # ────────────────────────────────────────────────────────────────────────────────
 #   Fetch CTD Basket List from CME Group
 # ────────────────────────────────────────────────────────────────────────────────
-def download_tcf_file() -> str:
+def download_tcf_file(transport=None, cache_dir: str = CACHE_DIR) -> tuple[str, str]:
+    """
+    Scrape the CME update date and fetch TCF.xlsx. Both requests are conditional, and
+    the XLSX request is skipped outright when the update date matches the cached one
+    and the local file is still there.
+    """
+    transport = transport or HttpTransport()
     print("Connecting to CME for TCF.xlsx metadata …")
-    base_url = "https://www.cmegroup.com/trading/interest-rates/treasury-conversion-factors.html"
-    headers   = {"User-Agent": "Mozilla/5.0"}
-    html = requests.get(base_url, headers=headers, timeout=10).text
+    page, _ = conditional_get(transport, BASE_URL, "tcf_page.html", cache_dir, timeout=10)
+    html = page.decode("utf-8", errors="replace")
 
     m = re.search(r"Updated U\.S\. Treasury Conversion Factors\s*-\s*(\d{1,2} \w+ \d{4})", html)
     if not m:
@@ -29,27 +117,34 @@ def download_tcf_file() -> str:
     tcf_url  = f"https://www.cmegroup.com/trading/interest-rates/files/TCF.xlsx?lastUpdated-{date_str}"
 
     out_path = os.path.join(os.getcwd(), "TCF.xlsx")
+    meta = _load_meta(cache_dir)
+    if meta.get("tcf_revision") == date_str and os.path.exists(out_path):
+        print(f"TCF.xlsx ({date_str}) unchanged; using", out_path)
+        return out_path, date_str
+
     print(f"Downloading TCF.xlsx ({date_str}) …")
-    r = requests.get(tcf_url, headers=headers, timeout=15)
-    r.raise_for_status()
-    with open(out_path, "wb") as f:
-        f.write(r.content)
-    print("Saved:", out_path)
-    return out_path
+    content, changed = conditional_get(transport, tcf_url, "TCF.xlsx", cache_dir)
+    if changed or not os.path.exists(out_path):
+        with open(out_path, "wb") as f:
+            f.write(content)
+    meta = _load_meta(cache_dir)
+    meta["tcf_revision"] = date_str
+    _save_meta(cache_dir, meta)
+    print("Saved:" if changed else "Not modified:", out_path)
+    return out_path, date_str
 
 # ────────────────────────────────────────────────────────────────────────────────
 #   Derive Spot Dirty CF.
 # ────────────────────────────────────────────────────────────────────────────────
-def run_scraper() -> None:
+def run_scraper(incremental: bool = True, transport=None) -> None:
     print("Starting UST Index Generator")
 
-    # CME download → dataframe
-    tcf_file = pd.DataFrame()
-    tcf_file = download_tcf_file()
+    # CME download → dataframe (conditional; transport is injectable, e.g. LocalTransport for fixtures)
+    tcf_file, revision = download_tcf_file(transport)
 
-    # Create USTs.index.csv via your helper
-    print("Deriving conversion factor.")
-    derive_cf()             # writes USTs.index.csv
+    # Create USTs.index.csv via your helper; incremental mode only recomputes new/changed CUSIPs
+    print(f"Deriving conversion factor (TCF revision {revision}).")
+    derive_cf(incremental=incremental, revision=revision, path=tcf_file)   # writes USTs.index.csv
 
     # Load USTs.index.csv
     csv_name = "UST.index.csv"
@@ -0,0 +1,184 @@
+"""
+curve.py
+"""
+import hashlib
+import numpy as np
+import pandas as pd
+from datetime import date
+from dates import to_days
+from zeroes import coupon_chain
+"""
+Zero-coupon curve bootstrapped from the priced UST universe (the implied frame from
+cf_ctd.fair_value_derivation). Bonds are stripped in maturity order with log discount factors
+linear in time between maturities (piecewise-flat forwards), then the curve is sampled once on
+a daily grid so df(t) is an index plus one linear interpolation, whatever the number of bonds.
+get_curve() caches the curve per (settle, inputs) so every consumer in a refresh shares it.
+"""
+
+DAYS_IN_YEAR = 365.0
+MAX_CURVE_DAYS = 31 * 366
+PRICE_COLUMNS = ("price", "BPrice", "yield")
+
+def dirty_prices(usts: pd.DataFrame, settle) -> np.ndarray:
+    """
+    Dirty price per bond: market clean `price` plus accrued interest when present,
+    otherwise the SIA dirty `BPrice`, otherwise BPrice_vec at the quoted `yield` (percent).
+    At least one of PRICE_COLUMNS is required: UST.index.csv (config.USTs) is reference data
+    only, so price it first (cf_ctd.fair_value_derivation) or merge quotes onto it.
+    """
+    if not set(PRICE_COLUMNS) & set(usts.columns):
+        raise ValueError(f"Curve inputs need one of {PRICE_COLUMNS}; got columns {list(usts.columns)}")
+    settle = np.datetime64(settle, "D")
+    cpn = pd.to_numeric(usts["coupon"], errors="coerce").to_numpy(dtype=float)
+    prev_cpn, next_cpn = to_days(usts["prev_coupon"].to_numpy()), to_days(usts["next_coupon"].to_numpy())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accrued = cpn / 2 * (settle - prev_cpn).astype(float) / (next_cpn - prev_cpn).astype(float)
+    accrued = np.where(np.isfinite(accrued), accrued, 0.0)
+    dirty = np.full(len(usts), np.nan)
+    if "price" in usts.columns:
+        dirty = pd.to_numeric(usts["price"], errors="coerce").to_numpy(dtype=float) + accrued
+    if "BPrice" in usts.columns:
+        dirty = np.where(np.isnan(dirty), pd.to_numeric(usts["BPrice"], errors="coerce").to_numpy(dtype=float), dirty)
+    if np.isnan(dirty).any() and "yield" in usts.columns:
+        from fixed_income_calc import BPrice_vec
+        y = pd.to_numeric(usts["yield"], errors="coerce").to_numpy(dtype=float) / 100
+        term = (to_days(usts["maturity_date"].to_numpy()) - settle).astype(float) / 365.25
+        dirty = np.where(np.isnan(dirty), BPrice_vec(cpn, term, y, 2, prev_cpn, settle, next_cpn, 1), dirty)
+    return dirty
+
+def cash_flows(coupon, next_cpn, mat_date, settle):
+    """(times in days from settle, amounts) as padded (bonds x flows) arrays; padding has amount 0."""
+    settle = np.datetime64(settle, "D")
+    chain, count = coupon_chain(next_cpn, mat_date)
+    cols = np.arange(chain.shape[1])[None, :]
+    live = (cols < count[:, None]) & (chain > settle)
+    amounts = np.where(live, np.asarray(coupon, dtype=float)[:, None] / 2, 0.0)
+    times = np.where(live, (chain - settle).astype(np.int64), 0)
+    # principal at maturity (an extra column so off-cycle maturities are exact)
+    mat_days = (np.asarray(mat_date, dtype="datetime64[D]") - settle).astype(np.int64)
+    return np.column_stack([times, mat_days]), np.column_stack([amounts, np.full(len(mat_days), 100.0)])
+
+class ZeroCurve:
+    """
+    Discount factors on a daily grid; df/zero/forward are O(1) per point and accept arrays.
+    `key` fingerprints the settle date, knots and grid length, so two curves share a key
+    exactly when they discount identically; caches key on it rather than on `version`.
+    """
+    def __init__(self, settle, knot_days, knot_log_df, version=0, max_days=MAX_CURVE_DAYS):
+        self.settle = np.datetime64(settle, "D")
+        self.knot_days = np.asarray(knot_days, dtype=float)
+        self.knot_log_df = np.asarray(knot_log_df, dtype=float)
+        self.version = version
+        h = hashlib.sha256(f"{self.settle}|{max_days}|".encode())
+        h.update(self.knot_days.tobytes())
+        h.update(self.knot_log_df.tobytes())
+        self.key = h.hexdigest()
+        days = np.arange(max_days + 1, dtype=float)
+        # flat forward beyond the last knot
+        last_fwd = (self.knot_log_df[-1] - self.knot_log_df[-2]) / (self.knot_days[-1] - self.knot_days[-2]) \
+            if len(self.knot_days) > 1 else (self.knot_log_df[-1] / self.knot_days[-1] if len(self.knot_days) else 0.0)
+        log_df = np.interp(days, self.knot_days, self.knot_log_df) if len(self.knot_days) else np.zeros_like(days)
+        beyond = days > (self.knot_days[-1] if len(self.knot_days) else 0.0)
+        if len(self.knot_days):
+            log_df[beyond] = self.knot_log_df[-1] + last_fwd * (days[beyond] - self.knot_days[-1])
+        self.grid = np.exp(log_df)
+
+    def df_days(self, days):
+        d = np.clip(np.asarray(days, dtype=float), 0, len(self.grid) - 1)
+        i = np.minimum(d.astype(np.int64), len(self.grid) - 2)
+        w = d - i
+        return self.grid[i] * (1 - w) + self.grid[i + 1] * w
+
+    def df(self, t):
+        """Discount factor for t years (Act/365) from settle."""
+        return self.df_days(np.asarray(t, dtype=float) * DAYS_IN_YEAR)
+
+    def df_dates(self, dates):
+        return self.df_days((to_days(dates) - self.settle).astype(float))
+
+    def zero(self, t, freq=2):
+        """Zero rate for t years, compounded `freq` times a year (0 for continuous)."""
+        t = np.asarray(t, dtype=float)
+        d = self.df(t)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if freq == 0:
+                return -np.log(d) / t
+            return freq * (np.power(d, -1.0 / (freq * t)) - 1)
+
+    def forward(self, t1, t2):
+        """Simple forward rate between t1 and t2 years."""
+        t1, t2 = np.asarray(t1, dtype=float), np.asarray(t2, dtype=float)
+        return (self.df(t1) / self.df(t2) - 1) / (t2 - t1)
+
+    def pv(self, times_days, amounts):
+        """PV of padded cash-flow matrices from cash_flows()."""
+        return (self.df_days(times_days) * amounts).sum(axis=-1)
+
+def bootstrap(usts: pd.DataFrame, settle=None, max_days=MAX_CURVE_DAYS, version=0, tol=1e-12) -> ZeroCurve:
+    """
+    Strip the curve bond by bond in maturity order. Each bond fixes the log discount factor at its
+    maturity (solved by Newton, linear in log DF from the previous knot); bonds maturing on the
+    same day are solved separately and averaged. Dates may be YYYYMMDD or ISO; prices come from
+    dirty_prices(). Raises ValueError when no bond is both live at settle and priced.
+    """
+    settle = np.datetime64(settle or date.today(), "D")
+    mat = to_days(usts["maturity_date"].to_numpy())
+    next_cpn = to_days(usts["next_coupon"].to_numpy())
+    cpn = pd.to_numeric(usts["coupon"], errors="coerce").to_numpy(dtype=float)
+    dirty = dirty_prices(usts, settle)
+    ok = ~np.isnat(mat) & (mat > settle) & np.isfinite(cpn) & np.isfinite(dirty) & (dirty > 0)
+    if not ok.any():
+        live = ~np.isnat(mat) & (mat > settle)
+        raise ValueError(f"No bond to bootstrap from: {len(usts)} rows, {int(live.sum())} maturing after {settle}, "
+                         f"{int((live & np.isfinite(dirty) & (dirty > 0)).sum())} of those priced")
+    next_cpn = np.where(np.isnat(next_cpn), mat, next_cpn)
+    mat, next_cpn, cpn, dirty = mat[ok], next_cpn[ok], cpn[ok], dirty[ok]
+    times, amounts = cash_flows(cpn, next_cpn, mat, settle)
+    mat_days = times[:, -1].astype(float)
+
+    knot_days, knot_log = [0.0], [0.0]
+    for m in np.unique(mat_days):
+        t0, x0 = knot_days[-1], knot_log[-1]
+        solved = []
+        for b in np.flatnonzero(mat_days == m):
+            t, a = times[b].astype(float), amounts[b]
+            known = (t <= t0) & (a > 0)
+            pv_known = (np.exp(np.interp(t[known], knot_days, knot_log)) * a[known]).sum()
+            live = (t > t0) & (a > 0)
+            w = (t[live] - t0) / (m - t0)
+            x = x0 - 0.04 * (m - t0) / DAYS_IN_YEAR if not solved else solved[-1]
+            for _ in range(50):
+                disc = np.exp(x0 + (x - x0) * w) * a[live]
+                f = pv_known + disc.sum() - dirty[b]
+                step = f / (disc * w).sum()
+                x -= step
+                if abs(step) < tol:
+                    break
+            if np.isfinite(x):
+                solved.append(x)
+        if solved:
+            knot_days.append(float(m))
+            knot_log.append(float(np.mean(solved)))
+    return ZeroCurve(settle, knot_days, knot_log, version, max_days)
+
+_cache = {"key": None, "curve": None, "version": 0}
+
+def _inputs_key(usts, settle):
+    cols = [c for c in ("cusip", "coupon", "maturity_date", "next_coupon", "prev_coupon", "price", "BPrice", "yield")
+            if c in usts.columns]
+    h = hashlib.sha256(pd.util.hash_pandas_object(usts[cols].astype(str), index=False).to_numpy().tobytes())
+    return str(np.datetime64(settle, "D")), h.hexdigest()
+
+def get_curve(usts: pd.DataFrame, settle=None) -> ZeroCurve:
+    """
+    The refresh's shared curve. Rebuilt only when the settle date or the UST inputs change;
+    each rebuild bumps ZeroCurve.version. `usts` must carry prices (see dirty_prices), e.g.
+    the implied frame cf_ctd_main passes through forwards.forward_matrix.
+    """
+    settle = np.datetime64(settle or date.today(), "D")
+    key = _inputs_key(usts, settle)
+    if _cache["key"] != key:
+        _cache["version"] += 1
+        _cache["curve"] = bootstrap(usts, settle, version=_cache["version"])
+        _cache["key"] = key
+    return _cache["curve"]
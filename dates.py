@@ -0,0 +1,52 @@
+"""
+dates.py
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from functools import lru_cache
+"""
+Shared date layer. Coupon, maturity and settle dates are parsed from YYYYMMDD
+once per security and carried as datetime64[D] day numbers, so the pricing
+functions only ever subtract integers.
+ - parse_yyyymmdd: cached scalar parse for the scalar analytics
+ - to_days: any column of dates -> datetime64[D] (NaT when missing)
+ - attach_day_columns: add <col>_D day columns to a frame once per refresh
+"""
+
+DAY_SUFFIX = "_D"
+
+@lru_cache(maxsize=65536)
+def parse_yyyymmdd(value):
+    return datetime.strptime(str(value)[:8], '%Y%m%d')
+
+def to_days(values):
+    """YYYYMMDD or ISO YYYY-MM-DD strings/ints, Timestamps or datetime64 -> datetime64[D] array."""
+    arr = np.asarray(values)
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return arr.astype("datetime64[D]")
+    flat = arr.reshape(-1)
+    if flat.dtype == object and any(isinstance(v, (datetime, np.datetime64)) for v in flat):
+        days = pd.to_datetime(pd.Series(flat), errors="coerce").to_numpy().astype("datetime64[D]")
+        return days.reshape(arr.shape)
+    # Parse each distinct string once; a HEDGES or UST column repeats the same few dates.
+    # ISO dates (UST.index.csv, HEDGES.csv after a CSV round trip) reduce to YYYYMMDD.
+    codes, uniques = pd.factorize(pd.Series(flat).astype(str).str.replace("-", "", regex=False).str.slice(0, 8))
+    parsed = pd.to_datetime(pd.Series(uniques), format="%Y%m%d", errors="coerce").to_numpy().astype("datetime64[D]")
+    days = np.append(parsed, np.datetime64("NaT", "D"))[codes]   # code -1 (missing) -> NaT
+    return days.reshape(arr.shape)
+
+def attach_day_columns(df: pd.DataFrame, cols, suffix=DAY_SUFFIX) -> pd.DataFrame:
+    for c in cols:
+        if c in df.columns:
+            df[f"{c}{suffix}"] = to_days(df[c].to_numpy())
+    return df
+
+def day_column(df: pd.DataFrame, col, suffix=DAY_SUFFIX):
+    """Prefer the pre-parsed <col>_D column when the frame carries one; NaT entries fall back to <col>."""
+    if f"{col}{suffix}" not in df.columns:
+        return to_days(df[col].to_numpy())
+    days = to_days(df[f"{col}{suffix}"].to_numpy())
+    if col in df.columns and np.isnat(days).any():
+        days = np.where(np.isnat(days), to_days(df[col].to_numpy()), days)
+    return days
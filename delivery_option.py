@@ -0,0 +1,101 @@
+"""
+delivery_option.py
+"""
+import numpy as np
+import pandas as pd
+from fixed_income_calc import BPrice_vec
+from cf_ctd import scatter_positions, ctd_candidates, deliverable_windows
+from forwards import bond_keys, delivery_dates
+"""
+Switch option in the deliverable basket. Every (future, deliverable) pair from ctd_candidates
+is repriced under a grid of yield scenarios in one (scenarios x pairs) batch:
+    shift_i(s) = parallel(s) + twist(s) * (term_i - pivot) / 10
+where term_i is the bond's term remaining at the future's delivery date and the pivot is the
+middle of the deliverable window on the same basis, so a twist of +10bp moves a bond ten
+years beyond the pivot by +10bp. Bonds are repriced at their delivery-date term. The scenario CTD is the lowest price / CF in
+each basket; the option value is the weighted shortfall of the base CTD against it.
+"""
+
+YEAR_DAYS = 365.25                   # years_to_maturity basis (zeroes.derive_cf)
+SCENARIO_PARALLEL_BP = 100.0
+SCENARIO_TWIST_BP = 50.0
+SCENARIO_SIGMA_PARALLEL_BP = 40.0
+SCENARIO_SIGMA_TWIST_BP = 15.0
+
+def scenario_grid(n_parallel=41, n_twist=21, parallel_bp=SCENARIO_PARALLEL_BP, twist_bp=SCENARIO_TWIST_BP,
+                  sigma_parallel_bp=SCENARIO_SIGMA_PARALLEL_BP, sigma_twist_bp=SCENARIO_SIGMA_TWIST_BP):
+    """
+    Parallel x twist grid (decimal yield shifts) with normal weights summing to one. The
+    unshifted scenario is always included; it is row 0.
+    """
+    p = np.linspace(-parallel_bp, parallel_bp, n_parallel) / 10000
+    t = np.linspace(-twist_bp, twist_bp, n_twist) / 10000 if n_twist > 1 else np.zeros(1)
+    P, T = np.meshgrid(p, t, indexing="ij")
+    P, T = np.concatenate([[0.0], P.ravel()]), np.concatenate([[0.0], T.ravel()])
+    sp, st = max(sigma_parallel_bp, 1e-12) / 10000, max(sigma_twist_bp, 1e-12) / 10000
+    w = np.exp(-0.5 * ((P / sp) ** 2 + (T / st) ** 2))
+    w[0] = 0.0                           # the base scenario is reported, not weighted
+    return pd.DataFrame({"parallel": P, "twist": T, "weight": w / w.sum()})
+
+def _segment_argmin(values, starts, n_cols):
+    """Per-row minimum and first arg-minimum column inside each [starts[k], starts[k+1]) segment."""
+    seg_min = np.minimum.reduceat(values, starts, axis=1)
+    counts = np.diff(np.append(starts, n_cols))
+    hit = values == np.repeat(seg_min, counts, axis=1)
+    score = np.where(hit, n_cols - np.arange(n_cols)[None, :], 0)
+    return seg_min, n_cols - np.maximum.reduceat(score, starts, axis=1)
+
+def delivery_option(HEDGES, implied, index=None, scenarios=None, forwards=None, settle=None):
+    """
+    Returns (report, ctd_by_scenario).
+    report is indexed by HEDGES row position with the base CTD (unshifted scenario), the
+    weighted switch probability, the option value in futures price points and the basket size.
+    ctd_by_scenario is a (scenarios x futures) frame of the CTD's implied row position.
+    With a forwards.ForwardMatrix the base prices are forward clean prices at each future's
+    delivery; otherwise they are clean prices at the quoted yields for the term left at delivery.
+    """
+    scenarios = scenario_grid() if scenarios is None else scenarios
+    settle = np.datetime64(settle or pd.Timestamp.today().date(), "D")
+    fi, bi, _, _ = ctd_candidates(HEDGES, implied, index)
+    cpn = pd.to_numeric(implied["coupon"], errors="coerce").to_numpy(dtype=float)[bi]
+    ytm = pd.to_numeric(implied["years_to_maturity"], errors="coerce").to_numpy(dtype=float)[bi]
+    yld = pd.to_numeric(implied["yield"], errors="coerce").to_numpy(dtype=float)[bi]
+    cf = pd.to_numeric(implied["conversion_factor"], errors="coerce").to_numpy(dtype=float)[bi]
+    term = ytm - (delivery_dates(HEDGES, settle)[fi] - settle).astype(float) / YEAR_DAYS   # left at delivery
+    ok = np.isfinite(cpn) & np.isfinite(term) & (term > 0) & np.isfinite(yld) & np.isfinite(cf) & (cf > 0)
+    order = np.lexsort((bi[ok], fi[ok]))
+    fi, bi, cpn, term, yld, cf = (a[ok][order] for a in (fi, bi, cpn, term, yld, cf))
+
+    lower, upper, _ = deliverable_windows(HEDGES)
+    pivot = (lower[fi] + upper[fi]) / 2 - pd.to_numeric(HEDGES["fut_year_to_maturity"], errors="coerce").to_numpy(dtype=float)[fi]
+    shift = scenarios["parallel"].to_numpy()[:, None] + scenarios["twist"].to_numpy()[:, None] * (term - pivot)[None, :] / 10
+    prices = BPrice_vec(cpn, term, yld[None, :] + shift)          # (scenarios, pairs) clean at delivery
+    if forwards is not None:
+        rows, cols = forwards.positions(bond_keys(implied)[bi], delivery_dates(HEDGES)[fi])
+        base = forwards.take("fwd_clean", rows, cols)
+        prices = np.where(np.isfinite(base), prices - prices[0] + base, prices)
+    ratio = np.where(np.isfinite(prices), prices / cf, np.inf)
+
+    futs, starts = np.unique(fi, return_index=True)
+    if len(futs) == 0:
+        return pd.DataFrame(columns=["base_ctd", "switch_prob", "option_value", "basket"]), pd.DataFrame()
+    seg_min, arg = _segment_argmin(ratio, starts, len(fi))
+    base_col = arg[0]
+    weights = scenarios["weight"].to_numpy()
+    switch = (arg != base_col[None, :])
+    option = ratio[:, base_col] - seg_min
+    report = pd.DataFrame({
+        "base_ctd": bi[base_col],
+        "switch_prob": weights @ switch,
+        "option_value": weights @ np.where(np.isfinite(option), option, 0.0),
+        "basket": np.diff(np.append(starts, len(fi))),
+    }, index=futs)
+    return report, pd.DataFrame(bi[arg], index=scenarios.index, columns=futs)
+
+def attach_delivery_option(HEDGES, implied, index=None, scenarios=None, forwards=None, settle=None):
+    """Write ctd_switch_prob / ctd_option_value next to the ctd_pairing columns of HEDGES."""
+    report, _ = delivery_option(HEDGES, implied, index, scenarios, forwards, settle)
+    pos = report.index.to_numpy()
+    scatter_positions(HEDGES, "ctd_switch_prob", pos, report["switch_prob"].to_numpy())
+    scatter_positions(HEDGES, "ctd_option_value", pos, report["option_value"].to_numpy())
+    return HEDGES
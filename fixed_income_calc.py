@@ -1,10 +1,12 @@
 """
 fixed_income_calc.py
 """
+import numpy as np
 import pandas as pd
 from math import pow
 from config import mvol
 from datetime import datetime, timedelta
+from dates import parse_yyyymmdd, to_days
 """
 SIA/FIA spot dirty formulas for:
  - No-arbitrage prices at market yield (BPrice, TPrice)
@@ -24,17 +26,17 @@ def round_ytm(ytm):
     return round(ytm * 2) / 2.0
 
 def calculate_term(settlement_date_str, maturity_date_str, day_count_convention=365.25):
-    settlement_date = datetime.strptime(settlement_date_str, '%Y%m%d')
-    maturity_date = datetime.strptime(maturity_date_str, '%Y%m%d')
+    settlement_date = parse_yyyymmdd(settlement_date_str)
+    maturity_date = parse_yyyymmdd(maturity_date_str)
     days_to_maturity = (maturity_date - settlement_date).days
     term_in_years = days_to_maturity / day_count_convention
     return term_in_years
 
 def accrual_period(begin, settle, next_coupon, day_count=1):
     if day_count == 1:
-        L = datetime.strptime(str(begin), '%Y%m%d')
-        S = datetime.strptime(str(settle), '%Y%m%d')
-        N = datetime.strptime(str(next_coupon if next_coupon is not None else settle), '%Y%m%d')
+        L = parse_yyyymmdd(begin)
+        S = parse_yyyymmdd(settle)
+        N = parse_yyyymmdd(next_coupon if next_coupon is not None else settle)
         return (S - L).days / (N - L).days
     else:
         # 30/360 convention
@@ -436,3 +438,213 @@ def fwd_fut_tail(A_FUT_DV01, A_FWD_DV01, A_MULT, B_FUT_DV01, B_FWD_DV01, B_MULT)
     else ((((B_FUT_DV01+B_FWD_DV01) * B_MULT) - ((A_FUT_DV01+A_FWD_DV01) * A_MULT)) /
     ((A_FUT_DV01+A_FWD_DV01) * A_MULT))
     )
+
+
+"""
+Vectorized kernels. Same conventions as the scalar functions above, but every
+argument may be a scalar, NumPy array or pandas Series and the whole column is
+priced in one broadcast call. Missing inputs come back as NaN instead of None.
+Dates may be YYYYMMDD strings or, preferably, datetime64[D] day numbers from
+dates.to_days / dates.attach_day_columns, which skip string parsing entirely.
+"""
+
+def _periods_vec(term, period=2):
+    term = np.asarray(term, dtype=float)
+    return np.trunc(np.round(term * 2) / 2.0 * period)
+
+def _ymd(days):
+    y = days.astype("datetime64[Y]")
+    m = days.astype("datetime64[M]")
+    year = y.astype(float) + 1970
+    month = (m - y.astype("datetime64[M]")).astype(float) + 1
+    day = (days - m.astype("datetime64[D]")).astype(float) + 1
+    nat = np.isnat(days)
+    return (np.where(nat, np.nan, year), np.where(nat, np.nan, month), np.where(nat, np.nan, day))
+
+def accrual_period_vec(begin, settle, next_coupon, day_count=1):
+    L = to_days(begin)
+    S = to_days(settle)
+    if day_count == 1:
+        N = to_days(next_coupon) if next_coupon is not None else S
+        N = np.where(np.isnat(N), S, N)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            v = (S - L).astype(float) / (N - L).astype(float)
+        return np.where(np.isnat(L) | np.isnat(S), np.nan, v)
+    # 30/360 convention
+    Ly, Lm, Ld = _ymd(L)
+    Sy, Sm, Sd = _ymd(S)
+    return (360 * (Sy - Ly) + 30 * (Sm - Lm) + Sd - Ld) / 180
+
+def _has_accrual(begin, settle, next_coupon):
+    if begin is None or settle is None or next_coupon is None:
+        return np.False_
+    return ~(np.isnat(to_days(begin)) | np.isnat(to_days(settle)) | np.isnat(to_days(next_coupon)))
+
+def aint_vec(cpn, period=2, begin=None, settle=None, next_coupon=None, day_count=1):
+    v = accrual_period_vec(begin, settle, next_coupon, day_count)
+    return np.asarray(cpn, dtype=float) / period * v
+
+def _schedule(cpn, term, period=2, begin=None, settle=None, next_coupon=None, day_count=1):
+    """Yield-independent inputs: coupon per period, periods, accrual fraction and accrued interest."""
+    cpn = np.asarray(cpn, dtype=float)
+    T = _periods_vec(term, period)
+    has_ai = _has_accrual(begin, settle, next_coupon)
+    if np.any(has_ai):
+        v = np.where(has_ai, accrual_period_vec(begin, settle, next_coupon, day_count), 0.0)
+        ai = np.where(has_ai, cpn / 2 * v, 0.0)
+    else:
+        v, ai = 0.0, 0.0
+    return cpn / period, T, v, has_ai, ai
+
+def _analytics(C, T, v, has_ai, ai, Y, period=2, duration=True, convexity=True):
+    """Price, modified duration and convexity at per-period yield Y sharing one set of discount factors."""
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        g = 1 + Y
+        dT = np.power(g, -T)            # (1+Y)^-T
+        dT1 = dT / g                    # (1+Y)^-(T+1)
+        annuity = 1 - dT
+        price = np.where(Y == 0, np.nan, C * annuity / Y + 100 * dT) + ai
+        mdur = cvx = None
+        if duration or convexity:
+            gv = np.power(g, v)
+            Y2 = Y * Y
+        if duration:
+            accrued = (-v * gv / g * C / Y * annuity
+                       + gv * (C / Y2 * annuity - T * C / Y * dT1 + (T - v) * 100 * dT1))
+            plain = (C / Y2 * annuity) + (T * (100 - C / Y) * dT1)
+            mdur = np.where(has_ai, accrued, plain) / (period * np.where(has_ai, gv * price, price))
+            mdur = np.where(price == 0, np.nan, mdur)
+        if convexity:
+            dcv = (
+                    -v * (v - 1) * gv / (g * g) * C / Y * annuity
+                    - 2 * v * gv / g * (C / Y2 * annuity - T * C / Y * dT1)
+                    - gv * (
+                            -C / (Y2 * Y) * annuity +
+                            2 * T * C / Y2 * dT1 +
+                            T * (T + 1) * C / Y * dT1 / g
+                    )
+                    + (T - v) * (T + 1) * 100 * dT1 / g * gv
+            )
+            cvx = np.where(price == 0, np.nan, dcv / (price * period ** 2))
+    return price, mdur, cvx
+
+def BPrice_vec(cpn, term, yield_, period=2, begin=None, settle=None, next_coupon=None, day_count=1):
+    C, T, v, has_ai, ai = _schedule(cpn, term, period, begin, settle, next_coupon, day_count)
+    Y = np.asarray(yield_, dtype=float) / period
+    return _analytics(C, T, v, has_ai, ai, Y, period, duration=False, convexity=False)[0]
+
+def TPrice_vec(cpn, term, yield_, period=2, begin=None, settle=None, next_coupon=None, day_count=1, conv_factor=None):
+    price = BPrice_vec(cpn, term, yield_, period, begin, settle, next_coupon, day_count)
+    return price / np.asarray(conv_factor, dtype=float)
+
+def MDur_vec(cpn, term, yield_, period=2, begin=None, settle=None, next_coupon=None, day_count=1):
+    C, T, v, has_ai, ai = _schedule(cpn, term, period, begin, settle, next_coupon, day_count)
+    Y = np.asarray(yield_, dtype=float) / period
+    return _analytics(C, T, v, has_ai, ai, Y, period, convexity=False)[1]
+
+def MacDur_vec(cpn, term, yield_, period=2, begin=None, settle=None, next_coupon=None, day_count=1):
+    mdur = MDur_vec(cpn, term, yield_, period, begin, settle, next_coupon, day_count)
+    return mdur * (1 + np.asarray(yield_, dtype=float) / period)
+
+def DV01_vec(cpn, term, yield_, period=2, begin=None, settle=None, next_coupon=None, day_count=1):
+    C, T, v, has_ai, ai = _schedule(cpn, term, period, begin, settle, next_coupon, day_count)
+    Y = np.asarray(yield_, dtype=float) / period
+    P, mdur, _ = _analytics(C, T, v, has_ai, ai, Y, period, convexity=False)
+    return np.round(mdur * P * 0.001, 6)
+
+def Cvx_vec(cpn, term, yield_, period=2, begin=None, settle=None, next_coupon=None, day_count=1):
+    C, T, v, has_ai, ai = _schedule(cpn, term, period, begin, settle, next_coupon, day_count)
+    Y = np.asarray(yield_, dtype=float) / period
+    return _analytics(C, T, v, has_ai, ai, Y, period, duration=False)[2]
+
+"""
+Risk bundle. Each shock is (name, yield shift, kind):
+ - 'dv01' -> round(MDur * Price * 0.001, 6) at the shifted yield (DV01minus)
+ - 'dur'  -> round(MDur * 0.001, 6) at the shifted yield (DV10, DV50, DV100, sensitivity22/55)
+"""
+DEFAULT_SHOCK_GRID = (
+    ("DV01_MINUS", -.0001, "dv01"),
+    ("DV10", .001, "dur"),
+    ("DV10_MINUS", -.001, "dur"),
+    ("DV50", .005, "dur"),
+    ("DV50_MINUS", -.005, "dur"),
+    ("DV100", .01, "dur"),
+    ("DV100_MINUS", -.01, "dur"),
+    ("DV22", .0002, "dur"),
+    ("DV22_MINUS", -.0002, "dur"),
+)
+
+def risk_bundle(cpn, term, yield_, period=2, begin=None, settle=None, next_coupon=None, day_count=1,
+                conv_factor=None, shocks=DEFAULT_SHOCK_GRID):
+    """
+    Price, MDur, MacDur, Cvx, DV01 and every shock in `shocks` in one pass.
+    Dates and accrual are resolved once; the base discount factors are shared by
+    price, duration and convexity, and each shock costs one extra evaluation.
+    With conv_factor, the futures-equivalent TPRICE, FUT_CVX, FUT_DV01 and
+    FUT_<shock> columns are added.
+    """
+    index = yield_.index if isinstance(yield_, pd.Series) else None
+    C, T, v, has_ai, ai = _schedule(cpn, term, period, begin, settle, next_coupon, day_count)
+    y = np.atleast_1d(np.asarray(yield_, dtype=float))
+    P, mdur, cvx = _analytics(C, T, v, has_ai, ai, y / period, period)
+
+    out = {"BPRICE": P, "MDUR": mdur, "MACDUR": mdur * (1 + y / period), "CVX": cvx,
+           "DV01": np.round(mdur * P * 0.001, 6)}
+    for name, shift, kind in shocks:
+        P_s, mdur_s, _ = _analytics(C, T, v, has_ai, ai, (y + shift) / period, period, convexity=False)
+        out[name] = np.round(mdur_s * (P_s if kind == "dv01" else 1.0) * 0.001, 6)
+
+    if conv_factor is not None:
+        cf = np.asarray(conv_factor, dtype=float)
+        out["TPRICE"] = P / cf
+        out["FUT_CVX"] = cvx / cf
+        out["FUT_DV01"] = out["DV01"] / cf
+        for name, _, _ in shocks:
+            out[f"FUT_{name}"] = out[name] / cf
+    return pd.DataFrame({k: np.broadcast_to(val, np.shape(y)) for k, val in out.items()}, index=index)
+
+"""
+Yield solver. calculate_ytm inverts BPrice_vec for whole columns of quotes.
+"""
+YTM_BRACKET = (-0.05, 1.0)
+
+def calculate_ytm(price, cpn, term, period=2, begin=None, settle=None, next_coupon=None, day_count=1,
+                  guess=None, tol=1e-10, max_iter=50):
+    """
+    Yield from price, the inverse of BPrice_vec on the same conventions (pass the same
+    dates for a dirty price, none for a clean one). Vectorized Newton-Raphson with
+    dP/dy = -MDur * P; a step leaving the bracket [lo, hi], or one that failed to halve
+    the pricing error, is replaced by bisection. (With accrual, MDur is the SIA duration
+    of the fractional-period price, not the exact slope of BPrice, so Newton alone can
+    cycle on short bonds.) Unsolvable rows (bad inputs, price outside the bracket) return NaN.
+    """
+    C, T, v, has_ai, ai = _schedule(cpn, term, period, begin, settle, next_coupon, day_count)
+    target = np.asarray(price, dtype=float)
+    shape = np.broadcast(target, C, T, v, ai).shape
+    target = np.broadcast_to(target, shape)
+    lo, hi = np.full(shape, YTM_BRACKET[0]), np.full(shape, YTM_BRACKET[1])
+    y = np.broadcast_to(np.asarray(guess if guess is not None else 0.05, dtype=float), shape).copy()
+    done = ~np.isfinite(target)
+    last_err = np.full(shape, np.inf)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(max_iter):
+            y = np.where(y == 0, 1e-6, y)                      # the annuity form is undefined at Y == 0
+            P, mdur, _ = _analytics(C, T, v, has_ai, ai, y / period, period, convexity=False)
+            diff = P - target
+            # price falls as yield rises: a price above target means the yield is too low
+            lo = np.where(diff > 0, y, lo)
+            hi = np.where(diff < 0, y, hi)
+            ny = y + diff / (mdur * P)
+            newton = np.isfinite(ny) & (ny > lo) & (ny < hi) & (np.abs(diff) <= 0.5 * last_err)
+            ny = np.where(newton, ny, (lo + hi) / 2)
+            last_err = np.abs(diff)
+            done |= (np.abs(ny - y) < tol) | (last_err == 0)
+            y = np.where(done, y, ny)
+            if done.all():
+                break
+        P_hi = _analytics(C, T, v, has_ai, ai, np.full(shape, YTM_BRACKET[1]) / period, period,
+                          duration=False, convexity=False)[0]
+        P_lo = _analytics(C, T, v, has_ai, ai, np.full(shape, YTM_BRACKET[0]) / period, period,
+                          duration=False, convexity=False)[0]
+    solvable = np.isfinite(target) & (target >= P_hi) & (target <= P_lo) & (T > 0)
+    return np.where(solvable, y, np.nan)
@@ -0,0 +1,277 @@
+"""
+forwards.py
+"""
+import numpy as np
+import pandas as pd
+from dates import to_days
+from curve import DAYS_IN_YEAR, cash_flows, dirty_prices, get_curve
+"""
+Forward dirty/clean prices of every deliverable to every delivery date in one array pass.
+ - Curve mode (repo=None): F = sum of flows after delivery discounted to delivery on the curve
+ - Repo mode: F = P (1 + r D/360) - sum_i c_i (1 + r (D - t_i)/360), r the term repo rate per delivery
+Cells are memoized per (bond terms, delivery date) under each (curve key[, repo]) so repeated
+calls in a refresh only price bonds or contract months that are new; lookups are index gathers.
+implied_repo inverts the repo formula for the rate that makes the bond's forward equal the
+invoice price F * CF + accrued, for every (future, deliverable) pair at once.
+"""
+
+_memo = {}          # (curve key, settle, repo mode) -> _MemoBlock
+MEMO_CURVES = 8     # memo blocks kept; the oldest curve's block is evicted first
+
+def delivery_dates(HEDGES, settle=None):
+    """Delivery date per future: an explicit fut_delivery_date/fut_expiry column, else settle + fut_year_to_maturity."""
+    settle = np.datetime64(settle or pd.Timestamp.today().date(), "D")
+    for col in ("fut_delivery_date", "fut_expiry", "fut_maturity_date"):
+        if col in HEDGES.columns:
+            return to_days(HEDGES[col].to_numpy())
+    years = pd.to_numeric(HEDGES["fut_year_to_maturity"], errors="coerce").to_numpy(dtype=float)
+    days = np.round(years * DAYS_IN_YEAR)
+    out = np.full(len(years), np.datetime64("NaT"), dtype="datetime64[D]")
+    ok = np.isfinite(days)
+    out[ok] = settle + days[ok].astype(np.int64).astype("timedelta64[D]")
+    return out
+
+def bond_keys(bonds):
+    for col in ("cusip", "cusip_y", "conid"):
+        if col in bonds.columns:
+            return bonds[col].astype(str).to_numpy()
+    return bonds.index.astype(str).to_numpy()
+
+def _indexer(index, values):
+    """get_indexer that tolerates duplicate labels in `index` (the last occurrence wins); -1 when absent."""
+    if index.is_unique:
+        return index.get_indexer(values)
+    keep = np.flatnonzero(~index.duplicated(keep="last"))
+    pos = index[keep].get_indexer(values)
+    return np.where(pos >= 0, keep[np.maximum(pos, 0)], -1)
+
+class ForwardMatrix:
+    """(bonds x deliveries) forward analytics; rows follow `keys`, columns follow `deliveries`."""
+    def __init__(self, keys, deliveries, fwd_dirty, accrued, income, spot_dirty, spot_accrued, curve_version):
+        self.keys = np.asarray(keys)
+        self.deliveries = np.asarray(deliveries, dtype="datetime64[D]")
+        self.fwd_dirty = fwd_dirty
+        self.accrued = accrued                 # accrued interest at delivery
+        self.income = income                   # coupons paid between settle and delivery
+        self.fwd_clean = fwd_dirty - accrued
+        self.spot_dirty = spot_dirty
+        self.spot_clean = spot_dirty - spot_accrued
+        self.carry = self.spot_clean[:, None] - self.fwd_clean
+        self.curve_version = curve_version
+        self._rows = pd.Index(self.keys)
+        self._cols = pd.Index(self.deliveries)
+
+    def positions(self, keys, dates):
+        """Row/column positions of (bond key, delivery date) pairs by hashed lookup; -1 when absent."""
+        rows = _indexer(self._rows, np.asarray(keys))
+        cols = self._cols.get_indexer(np.asarray(dates, dtype="datetime64[D]"))
+        return rows.astype(np.int64), cols.astype(np.int64)
+
+    def take(self, name, rows, cols):
+        """Gather one analytic for (row, col) pairs; -1 positions give NaN."""
+        values = getattr(self, name)
+        out = np.full(len(rows), np.nan)
+        ok = (rows >= 0) & (cols >= 0)
+        out[ok] = values[rows[ok], cols[ok]] if values.ndim == 2 else values[rows[ok]]
+        return out
+
+    def implied_futures(self, conv_factor):
+        """Futures price each bond implies at each delivery: forward clean / CF."""
+        return self.fwd_clean / np.asarray(conv_factor, dtype=float)[:, None]
+
+    def net_basis(self, fut_price, conv_factor, rows, cols):
+        """Forward net basis F_clean - fut * CF for (future, bond) pairs."""
+        return self.take("fwd_clean", rows, cols) - np.asarray(fut_price, dtype=float) * np.asarray(conv_factor, dtype=float)
+
+def _compute(bonds, deliveries, settle, curve, repo):
+    cpn = pd.to_numeric(bonds["coupon"], errors="coerce").to_numpy(dtype=float)
+    mat = to_days(bonds["maturity_date"].to_numpy())
+    next_cpn = to_days(bonds["next_coupon"].to_numpy())
+    prev_cpn = to_days(bonds["prev_coupon"].to_numpy())
+    next_cpn = np.where(np.isnat(next_cpn), mat, next_cpn)
+    times, amounts = cash_flows(cpn, next_cpn, mat, settle)
+    coupon_t = times[:, :-1][:, :, None].astype(float)                 # (n, k, 1) coupon dates in days
+    coupon_a = amounts[:, :-1][:, :, None]
+    D = (deliveries - settle).astype(float)[None, None, :]              # (1, 1, m)
+
+    paid = (coupon_a > 0) & (coupon_t <= D)
+    income = (coupon_a * paid).sum(axis=1)
+    if repo is None:
+        df_d = curve.df_days(D[0])                                       # (1, m)
+        after = (amounts[:, :, None] > 0) & (times[:, :, None] > D)
+        pv_after = (curve.df_days(times)[:, :, None] * amounts[:, :, None] * after).sum(axis=1)
+        fwd = pv_after / df_d
+        spot = curve.pv(times, amounts)
+    else:
+        r = np.broadcast_to(np.asarray(repo, dtype=float), deliveries.shape)[None, None, :]
+        spot = dirty_prices(bonds, settle)
+        fwd = spot[:, None] * (1 + r[0] * D[0] / 360) - (coupon_a * paid * (1 + r * (D - coupon_t) / 360)).sum(axis=1)
+
+    accrued = accrued_at(cpn[:, None], (prev_cpn - settle).astype(float)[:, None], coupon_t, coupon_a, D, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        spot_accrued = cpn / 2 * (settle - prev_cpn).astype(float) / ((next_cpn - prev_cpn).astype(float))
+    past_maturity = D[0] >= (mat - settle).astype(float)[:, None]
+    fwd = np.where(past_maturity, np.nan, fwd)
+    return fwd, np.where(past_maturity, np.nan, accrued), income, spot, np.nan_to_num(spot_accrued)
+
+def accrued_at(cpn, prev_t, coupon_t, coupon_a, D, axis=-1):
+    """
+    Accrued interest at day D (days from settle): from the last coupon paid on/before D
+    (or the bond's previous coupon, prev_t <= 0) to the next coupon after D. `axis` is the
+    coupon axis of coupon_t/coupon_a; past the last coupon accrued is 0.
+    """
+    paid = (coupon_a > 0) & (coupon_t <= D)
+    last = np.where(paid, coupon_t, -np.inf).max(axis=axis)
+    last = np.where(np.isfinite(last), last, prev_t)
+    nxt = np.where((coupon_a > 0) & (coupon_t > D), coupon_t, np.inf).min(axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(np.isfinite(nxt), cpn / 2 * (np.squeeze(D, axis=axis) - last) / (nxt - last), 0.0)
+
+class _MemoBlock:
+    """Memoized cells of one curve: (5, rows, columns) values plus a filled mask, rows/columns hashed."""
+    def __init__(self):
+        self.rows = pd.Index([], dtype=object)
+        self.cols = pd.Index([], dtype=object)
+        self.values = np.empty((5, 0, 0))
+        self.filled = np.zeros((0, 0), dtype=bool)
+
+    def lookup(self, row_keys, col_keys):
+        """(5, n, m) cached values and the (n, m) hit mask, by vectorized index gathers."""
+        ri = self.rows.get_indexer(row_keys)
+        ci = self.cols.get_indexer(col_keys)
+        hit = (ri >= 0)[:, None] & (ci >= 0)[None, :]
+        out = np.full((5, len(ri), len(ci)), np.nan)
+        if hit.any():
+            r, c = np.maximum(ri, 0)[:, None], np.maximum(ci, 0)[None, :]
+            hit &= self.filled[r, c]
+            out = np.where(hit[None], self.values[:, r, c], np.nan)
+        return out, hit
+
+    def store(self, row_keys, col_keys, values):
+        row_keys = pd.Index(row_keys)
+        keep = ~row_keys.duplicated(keep="last")
+        row_keys, values = row_keys[keep], values[:, keep]
+        new_rows = row_keys.difference(self.rows, sort=False)
+        new_cols = pd.Index(col_keys, dtype=object).difference(self.cols, sort=False)
+        if len(new_rows) or len(new_cols):
+            self.rows, self.cols = self.rows.append(new_rows), self.cols.append(new_cols)
+            grow = ((0, 0), (0, len(new_rows)), (0, len(new_cols)))
+            self.values = np.pad(self.values, grow, constant_values=np.nan)
+            self.filled = np.pad(self.filled, grow[1:], constant_values=False)
+        ri, ci = self.rows.get_indexer(row_keys), self.cols.get_indexer(col_keys)
+        self.values[:, ri[:, None], ci[None, :]] = values
+        self.filled[ri[:, None], ci[None, :]] = True
+
+def _row_keys(bonds, keys, settle, repo):
+    """Memo row key: bond identity plus every term the cells depend on (and the price in repo mode)."""
+    parts = [pd.Series(keys, dtype=object)]
+    parts.append(pd.Series(pd.to_numeric(bonds["coupon"], errors="coerce").to_numpy(dtype=float)).round(8).astype(str))
+    for col in ("maturity_date", "next_coupon", "prev_coupon"):
+        parts.append(pd.Series(to_days(bonds[col].to_numpy())).astype(str))
+    if repo is not None:
+        parts.append(pd.Series(dirty_prices(bonds, settle)).astype(str))
+    key = parts[0].astype(str)
+    for part in parts[1:]:
+        key = key + "|" + part.to_numpy()
+    return key.to_numpy()
+
+def forward_matrix(bonds: pd.DataFrame, deliveries, settle=None, curve=None, repo=None) -> ForwardMatrix:
+    """
+    Forward analytics for every bond in `bonds` (coupon, maturity/prev/next coupon dates and a price)
+    against every unique delivery date. Only (bond, delivery) cells missing from the memo are computed.
+    """
+    settle = np.datetime64(settle or pd.Timestamp.today().date(), "D")
+    curve = curve or get_curve(bonds, settle)
+    deliveries = np.unique(np.asarray(deliveries, dtype="datetime64[D]"))
+    deliveries = deliveries[~np.isnat(deliveries)]
+    keys = bond_keys(bonds)
+    col_keys = deliveries.astype(str).astype(object)
+    if repo is not None:   # repo-mode cells depend on the delivery's term rate
+        col_keys = col_keys + "|" + np.broadcast_to(np.asarray(repo, dtype=float), deliveries.shape).astype(str)
+    tag = (curve.key, str(settle), repo is not None)
+    if tag not in _memo:
+        while len(_memo) >= MEMO_CURVES:
+            _memo.pop(next(iter(_memo)))
+        _memo[tag] = _MemoBlock()
+    block = _memo[tag]
+    row_keys = _row_keys(bonds, keys, settle, repo)
+    n, m = len(keys), len(deliveries)
+    fields, hit = block.lookup(row_keys, col_keys)
+    missing = ~hit.all(axis=1) if m else np.zeros(n, dtype=bool)
+    if missing.any():
+        rows = np.flatnonzero(missing)
+        fwd, accrued, income, spot, spot_ai = _compute(bonds.iloc[rows], deliveries, settle, curve, repo)
+        fields[0, rows], fields[1, rows], fields[2, rows] = fwd, accrued, income
+        fields[3, rows], fields[4, rows] = spot[:, None], spot_ai[:, None]
+        block.store(row_keys[rows], col_keys, fields[:, rows])
+    return ForwardMatrix(keys, deliveries, fields[0], fields[1], fields[2], fields[3][:, 0] if m else np.full(n, np.nan),
+                         fields[4][:, 0] if m else np.zeros(n), curve.version)
+
+REPO_BASIS = 365   # days basis, as in KPIs2_Orders.sia_carry
+
+def implied_repo(fut_price, conv_factor, dirty_price, accrued_delivery, days, coupon_days=None, coupon_amounts=None,
+                 basis=REPO_BASIS, compounding=False, tol=1e-12, max_iter=50):
+    """
+    Exact implied repo for arrays of pairs. coupon_days/coupon_amounts are padded (pairs x k)
+    matrices of coupons paid between settle and delivery (days from settle, amount 0 as padding).
+    Simple interest (closed form, coupons reinvested to delivery at the same rate):
+        P (1 + r d/B) = invoice + sum c_i (1 + r (d - t_i)/B)
+    compounding=True solves P (1+r)^(d/B) = invoice + sum c_i (1+r)^((d - t_i)/B) by a
+    vectorized Newton iteration, falling back to bisection steps whenever Newton leaves the bracket.
+    """
+    F = np.asarray(fut_price, dtype=float)
+    P = np.asarray(dirty_price, dtype=float)
+    d = np.asarray(days, dtype=float)
+    invoice = F * np.asarray(conv_factor, dtype=float) + np.asarray(accrued_delivery, dtype=float)
+    if coupon_days is None:
+        t = np.zeros(np.broadcast(invoice, d).shape + (1,))
+        c = np.zeros_like(t)
+    else:
+        t = np.asarray(coupon_days, dtype=float)
+        c = np.where(t <= d[..., None], np.asarray(coupon_amounts, dtype=float), 0.0)
+    tau = (d[..., None] - t) / basis
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = (invoice + c.sum(axis=-1) - P) / (P * d / basis - (c * tau).sum(axis=-1))
+    if not compounding:
+        return np.where(d > 0, r, np.nan)
+
+    T = d / basis
+    lo, hi = np.full(r.shape, -0.99), np.full(r.shape, 10.0)
+    r = np.clip(np.where(np.isfinite(r), r, 0.0), lo + 1e-9, hi)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(max_iter):
+            g = 1 + r
+            f = P * g ** T - invoice - (c * g[..., None] ** tau).sum(axis=-1)
+            df = P * T * g ** (T - 1) - (c * tau * g[..., None] ** (tau - 1)).sum(axis=-1)
+            # f is increasing in r when the bond outweighs the reinvested coupons: keep a bracket
+            lo = np.where(f < 0, r, lo)
+            hi = np.where(f > 0, r, hi)
+            step = f / df
+            nr = r - step
+            nr = np.where(np.isfinite(nr) & (nr > lo) & (nr < hi), nr, (lo + hi) / 2)
+            done = np.abs(nr - r) < tol
+            r = nr
+            if np.all(done | ~np.isfinite(r)):
+                break
+    return np.where(d > 0, r, np.nan)
+
+def pair_implied_repo(HEDGES, implied, fi, bi, settle=None, basis=REPO_BASIS, compounding=False):
+    """implied_repo for (future, deliverable) position pairs, e.g. from cf_ctd.ctd_candidates."""
+    settle = np.datetime64(settle or pd.Timestamp.today().date(), "D")
+    cpn = pd.to_numeric(implied["coupon"], errors="coerce").to_numpy(dtype=float)[bi]
+    mat = to_days(implied["maturity_date"].to_numpy())[bi]
+    prev_cpn = to_days(implied["prev_coupon"].to_numpy())[bi]
+    next_cpn = to_days(implied["next_coupon"].to_numpy())[bi]
+    next_cpn = np.where(np.isnat(next_cpn), mat, next_cpn)
+    dirty = dirty_prices(implied.iloc[bi], settle) if "BPrice" not in implied else \
+        pd.to_numeric(implied["BPrice"], errors="coerce").to_numpy(dtype=float)[bi]
+    times, amounts = cash_flows(cpn, next_cpn, mat, settle)
+    coupon_t, coupon_a = times[:, :-1].astype(float), amounts[:, :-1]
+    days = (delivery_dates(HEDGES, settle)[fi] - settle).astype(float)
+    accrued = accrued_at(cpn, (prev_cpn - settle).astype(float), coupon_t, coupon_a, days[:, None], axis=-1)
+    fut_price = pd.to_numeric(HEDGES["fut_price"], errors="coerce").to_numpy(dtype=float)[fi]
+    cf = pd.to_numeric(implied["conversion_factor"], errors="coerce").to_numpy(dtype=float)[bi]
+    return implied_repo(fut_price, cf, dirty, accrued, days, coupon_t, coupon_a, basis, compounding)
+
+def clear_forward_cache():
+    _memo.clear()
@@ -0,0 +1,201 @@
+"""
+hjm.py
+"""
+import numpy as np
+import config
+"""
+Far-forward HJM tree from HJM.xlsm (sheet HJM_exp), built with NumPy level by level.
+ - Year-t spot zeros Z(t) and Threefy log-yield vols σ(t) (config.THREEFY{t}_ln_y100_std)
+ - Stationary calibration: adj z(t) = Z(t) + (calibration + σ(t)) / 50000
+ - Root forward f0 = adj z(1); every node f branches into three children at level k
+       up   = (f + shift) * exp(10 σ(k+1))
+       mid  =  f          * exp(10 σ(k+1))
+       down = (f - shift) * exp(10 σ(k+1))
+   with shift the futures-implied σ (B4). The tree does not recombine: level k holds
+   3**k rates and the children of node i sit at 3i, 3i+1, 3i+2.
+Every array carries a leading curve axis, so many curves are built and priced at once.
+rollback_streaming values one curve depth-first in bounded memory (see its docstring),
+for horizons where 3**levels rates no longer fit.
+"""
+
+FUT_IMPLIED_SHIFT = 0.002     # HJM_exp!B4
+CALIBRATION = -984.07         # HJM_exp!B9
+ROOT_SPREAD_BP = 62.0         # HJM_exp!D8 (put cost, bp)
+NODE_SPREAD_BP = 0.0          # HJM_exp!D9
+HJM_YEARS = 6
+
+def fred_inputs(years=HJM_YEARS, series="THREEFY"):
+    """
+    (zeros, sigmas) for years 1..`years` from the FRED Threefy series: σ from the
+    config attributes derive_vol sets, Z(t) from the latest cached observation (percent -> decimal).
+    """
+    from volatility import load_cached_series
+    sigmas = np.array([getattr(config, f"{series}{t}_ln_y100_std", np.nan) for t in range(1, years + 1)], dtype=float)
+    zeros = np.full(years, np.nan)
+    for t in range(1, years + 1):
+        df = load_cached_series(f"{series}{t}")
+        if not df.empty:
+            zeros[t - 1] = df["yield_pct"].iloc[-1] / 100.0
+    return zeros, sigmas
+
+def adjusted_zeros(zeros, sigmas, calibration=CALIBRATION):
+    """Row 14 of the sheet: Z(t) + (calibration + σ(t)) / 50000. Broadcasts over curves."""
+    return np.asarray(zeros, dtype=float) + (calibration + np.asarray(sigmas, dtype=float)) / 50000.0
+
+def build_tree(f0, sigmas, shift=FUT_IMPLIED_SHIFT, levels=None):
+    """
+    Forward-rate tree as a list of arrays, level k of shape (curves, 3**k).
+    f0 is the root rate per curve; sigmas is (years,) or (curves, years), and
+    level k+1 uses σ(k+1) (0-based sigmas[..., k+1]).
+    """
+    f = np.atleast_1d(np.asarray(f0, dtype=float))[:, None]
+    sig = np.atleast_2d(np.asarray(sigmas, dtype=float))
+    sig = np.broadcast_to(sig, (f.shape[0], sig.shape[-1]))
+    levels = sig.shape[-1] if levels is None else levels
+    tree = [f]
+    for k in range(1, levels):
+        growth = np.exp(10.0 * sig[:, k])[:, None, None]
+        f = (np.stack([f + shift, f, f - shift], axis=-1) * growth).reshape(f.shape[0], -1)
+        tree.append(f)
+    return tree
+
+def rollback(tree, coupon=0.0, face=100.0, cap=None, node_spread_bp=NODE_SPREAD_BP,
+             root_spread_bp=ROOT_SPREAD_BP, terminal_rate=None):
+    """
+    Backward induction on `tree`; returns the root value per curve.
+    Leaves pay face + coupon discounted one year at their own rate (or `terminal_rate`,
+    the sheet's adj z of the last year); interior nodes discount the average of their three
+    children at the node rate. With `cap` each non-root node is MIN(cap, discounted) + coupon,
+    as in the futures sheet; otherwise it is discounted + coupon.
+    """
+    s_node = node_spread_bp / 10000.0
+    leaf = tree[-1] if terminal_rate is None else np.asarray(terminal_rate, dtype=float).reshape(-1, 1)
+    v = np.broadcast_to((face + coupon) / (1.0 + leaf + s_node), tree[-1].shape)
+    if cap is not None:
+        v = np.minimum(cap, v)
+    v = v + coupon
+    for f in tree[-2:0:-1]:
+        v = v.reshape(f.shape[0], -1, 3).mean(axis=-1) / (1.0 + f + s_node)
+        if cap is not None:
+            v = np.minimum(cap, v)
+        v = v + coupon
+    return v.mean(axis=-1) / (1.0 + tree[0][:, 0] + root_spread_bp / 10000.0)
+
+def _path_values(f, k, growth, shift, coupon, face, cap, s_node, terminal_rate, direction, dtype):
+    """
+    Value of nodes `f` at level k when every descendant at level j takes the rate of the
+    all-up (+1), all-mid (0) or all-down (-1) path. Rates are monotone in the parent, so the
+    up/down paths bound the true subtree value from below/above.
+    """
+    rates = [f]
+    for g in growth[k + 1:]:
+        rates.append(((rates[-1] + dtype(direction * shift)) * g).astype(dtype))
+    leaf = rates[-1] if terminal_rate is None else np.full_like(rates[-1], terminal_rate, dtype=dtype)
+    v = (face + coupon) / (1 + leaf + s_node)
+    if cap is not None:
+        v = np.minimum(cap, v)
+    v = v + coupon
+    for r in rates[-2::-1]:
+        v = v / (1 + r + s_node)
+        if cap is not None:
+            v = np.minimum(cap, v)
+        v = v + coupon
+    return v.astype(dtype)
+
+def rollback_streaming(f0, sigmas, shift=FUT_IMPLIED_SHIFT, coupon=0.0, face=100.0, cap=None,
+                       node_spread_bp=NODE_SPREAD_BP, root_spread_bp=ROOT_SPREAD_BP, terminal_rate=None,
+                       max_nodes=1 << 20, error_bound=0.0, dtype=np.float64):
+    """
+    Same valuation as rollback(build_tree(f0, sigmas, shift), ...) for one curve, without
+    materialising the tree. Nodes are expanded depth-first in chunks of at most `max_nodes`,
+    so memory is O(levels * max_nodes) instead of O(3**levels); dtype=np.float32 halves it again.
+
+    Pruning: a node whose subtree value is bracketed by its all-up and all-down paths within
+    `error_bound` is valued on its mid path instead of being expanded. Pruned subtrees are
+    disjoint and each carries probability 3**-k <= 1, so with non-negative discount rates the
+    root error is at most `error_bound`. Subtrees pinned at the cap have zero width and are
+    pruned exactly even with error_bound=0.
+
+    Returns (value, realised_bound, nodes_expanded).
+    """
+    dtype = np.dtype(dtype).type
+    sig = np.asarray(sigmas, dtype=float).reshape(-1)
+    levels = len(sig)
+    growth = [dtype(np.exp(10.0 * x)) for x in sig]
+    s_node = dtype(node_spread_bp / 10000.0)
+    cap_ = None if cap is None else dtype(cap)
+    coupon_, face_ = dtype(coupon), dtype(face)
+    bound, expanded = 0.0, 0
+    kw = dict(growth=growth, shift=shift, coupon=coupon_, face=face_, cap=cap_, s_node=s_node,
+              terminal_rate=terminal_rate, dtype=dtype)
+
+    def children(f, k):
+        return ((np.stack([f + dtype(shift), f, f - dtype(shift)], axis=-1) * growth[k + 1]).reshape(-1)).astype(dtype)
+
+    def solve(f, k):
+        nonlocal bound, expanded
+        expanded += len(f)
+        if k == levels - 1:
+            return _path_values(f, k, direction=0, **kw)
+        values = np.empty(len(f), dtype=dtype)
+        keep = np.ones(len(f), dtype=bool)
+        if cap_ is not None or error_bound > 0:
+            lo = _path_values(f, k, direction=1, **kw)
+            hi = _path_values(f, k, direction=-1, **kw)
+            width = (hi - lo).astype(float)
+            prune = width <= error_bound
+            if prune.any():
+                values[prune] = _path_values(f[prune], k, direction=0, **kw)
+                bound = max(bound, float(width[prune].max()))
+                keep = ~prune
+        idx = np.flatnonzero(keep)
+        step = max(1, max_nodes // 3)
+        for start in range(0, len(idx), step):
+            part = idx[start:start + step]
+            v = solve(children(f[part], k), k + 1).reshape(-1, 3).mean(axis=-1)
+            v = v / (1 + f[part] + s_node)
+            if cap_ is not None:
+                v = np.minimum(cap_, v)
+            values[part] = v + coupon_
+        return values
+
+    root = dtype(np.asarray(f0, dtype=float).reshape(-1)[0])
+    if levels == 1:   # the root is the leaf: same leaf step as rollback on a one-level tree
+        expanded += 1
+        v = _path_values(np.array([root], dtype=dtype), 0, direction=0, **kw)
+    else:
+        v = solve(children(np.array([root], dtype=dtype), 0), 1)
+    value = float(v.mean() / (1 + root + dtype(root_spread_bp / 10000.0)))
+    return value, bound, expanded
+
+def price_bond(tree, coupon, maturity, face=100.0, spread_bp=0.0):
+    """
+    Annual-pay coupon bond (coupon in price points per year) maturing `maturity` years out,
+    1 <= maturity <= len(tree): the first `maturity` levels carry its cash flows.
+    """
+    if maturity == 1:
+        return (face + coupon) / (1.0 + tree[0][:, 0] + spread_bp / 10000.0)
+    return rollback(tree[:maturity], coupon=coupon, face=face, node_spread_bp=spread_bp, root_spread_bp=spread_bp)
+
+def price_zero(tree, maturity, face=100.0, spread_bp=0.0):
+    """Zero-coupon bond maturing `maturity` years out."""
+    return price_bond(tree, 0.0, maturity, face, spread_bp)
+
+def futures_tree_price(fut_price, conv_factor, coupon, zeros=None, sigmas=None, shift=FUT_IMPLIED_SHIFT,
+                       calibration=CALIBRATION, root_spread_bp=ROOT_SPREAD_BP, node_spread_bp=NODE_SPREAD_BP):
+    """
+    HJM_exp!H32: CTD value on the tree, capped at the cash equivalent fut_price * CF at every
+    node and discounted at the last adjusted zero at the leaves. zeros/sigmas default to fred_inputs().
+    Returns a scalar for one curve, an array when zeros is (curves, years).
+    """
+    if zeros is None or sigmas is None:
+        z, s = fred_inputs()
+        zeros = z if zeros is None else zeros
+        sigmas = s if sigmas is None else sigmas
+    zeros = np.asarray(zeros, dtype=float)
+    z_adj = np.atleast_2d(adjusted_zeros(zeros, sigmas, calibration))
+    tree = build_tree(z_adj[:, 0], sigmas, shift)
+    cash_eq = np.asarray(fut_price, dtype=float) * np.asarray(conv_factor, dtype=float)
+    value = rollback(tree, coupon=coupon, face=100.0, cap=np.reshape(cash_eq, (-1, 1)), node_spread_bp=node_spread_bp,
+                     root_spread_bp=root_spread_bp, terminal_rate=z_adj[:, -1])
+    return float(value[0]) if zeros.ndim == 1 else value
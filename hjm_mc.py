@@ -0,0 +1,122 @@
+"""
+hjm_mc.py
+"""
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from hjm import FUT_IMPLIED_SHIFT, CALIBRATION, adjusted_zeros, fred_inputs
+"""
+Monte Carlo on the HJM.xlsm dynamics (see hjm.py). Each year the short forward moves
+    f -> (f + e * shift) * exp(10 σ(k+1)),   e in {+1, 0, -1} with probability 1/3 each,
+which is the tree's three-branch step sampled instead of enumerated; a bond priced on
+these paths converges to hjm.rollback on the uncapped tree. At delivery, each bond is
+valued on the path's mid continuation (the tree's all-mid path from the delivery node).
+Paths are generated in blocks; each block has its own SeedSequence child, so results
+depend on (seed, n_paths, block) but not on how many worker processes run the blocks.
+"""
+
+MC_PATHS = 100_000
+MC_BLOCK = 10_000
+
+def _extend(sigmas, levels):
+    """Stationary tail: reuse the last σ for years beyond the supplied curve."""
+    sig = np.asarray(sigmas, dtype=float).reshape(-1)
+    if len(sig) >= levels:
+        return sig[:levels]
+    return np.concatenate([sig, np.full(levels - len(sig), sig[-1])])
+
+def simulate_paths(f0, sigmas, n_paths, rng, shift=FUT_IMPLIED_SHIFT, levels=None):
+    """(n_paths, levels) short-forward paths; column k is the rate set at year k."""
+    sig = _extend(sigmas, levels or len(np.atleast_1d(sigmas)))
+    paths = np.empty((n_paths, len(sig)))
+    paths[:, 0] = f0
+    shocks = rng.integers(-1, 2, size=(n_paths, len(sig) - 1)) * shift
+    for k in range(1, len(sig)):
+        paths[:, k] = (paths[:, k - 1] + shocks[:, k - 1]) * np.exp(10.0 * sig[k])
+    return paths
+
+def _mid_continuation(f, sig, start, years):
+    """Rates for years start..start+years-1 on the all-mid path from f at `start`."""
+    growth = np.exp(10.0 * np.cumsum(sig[start + 1:start + years]))
+    return np.column_stack([f, f[:, None] * growth[None, :]]) if years > 1 else f[:, None]
+
+def _bond_values(rates, coupon, years, face, spread):
+    """Value at the start of `rates` of annual coupons and face over `years` years."""
+    disc = np.cumprod(1.0 / (1.0 + rates[:, :years] + spread), axis=1)
+    return disc.sum(axis=1) * coupon + disc[:, years - 1] * face
+
+def _block(args):
+    (seed, n_paths, f0, sig, shift, spread, delivery, coupons, years, conv_factors, face, base) = args
+    rng = np.random.default_rng(seed)
+    paths = simulate_paths(f0, sig, n_paths, rng, shift, len(sig))
+    disc = np.prod(1.0 / (1.0 + paths[:, :delivery] + spread), axis=1)
+    prices = np.empty((n_paths, len(coupons)))
+    for i, (c, n) in enumerate(zip(coupons, years)):
+        prices[:, i] = _bond_values(_mid_continuation(paths[:, delivery], sig, delivery, n), c, n, face, spread)
+    ratio = prices / conv_factors
+    ctd = ratio.argmin(axis=1)
+    fut = ratio[np.arange(n_paths), ctd]
+    option = disc * (ratio[:, base] - fut)
+    return {"n": n_paths, "fut": fut.sum(), "fut2": (fut ** 2).sum(), "opt": option.sum(), "opt2": (option ** 2).sum(),
+            "pv": (disc[:, None] * prices).sum(axis=0), "ctd": np.bincount(ctd, minlength=len(coupons)),
+            "switch": int((ctd != base).sum())}
+
+def _run_blocks(tasks, workers):
+    if workers == 1 or len(tasks) == 1:
+        return [_block(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(_block, tasks))
+
+def mc_delivery_option(coupons, years, conv_factors, delivery_year, zeros=None, sigmas=None, shift=FUT_IMPLIED_SHIFT,
+                       calibration=CALIBRATION, spread_bp=0.0, face=100.0, n_paths=MC_PATHS, block=MC_BLOCK,
+                       workers=None, seed=0, base_ctd=None):
+    """
+    Deliverable basket and delivery option on simulated paths.
+    coupons/years/conv_factors describe each deliverable (annual coupon in points, whole years
+    of cash flows remaining after delivery); delivery_year is the delivery step on the annual grid.
+    base_ctd is the bond the switch and option value are measured against (default: the CTD on
+    the all-mid path). Returns a dict with the futures price E[min P/CF], the discounted option
+    value E[D (P_base/CF_base - min P/CF)] with standard errors, the switch probability and a
+    per-bond basket frame (PV of the delivered bond, CTD probability).
+    """
+    coupons = np.asarray(coupons, dtype=float)
+    years = np.asarray(years, dtype=int)
+    conv_factors = np.asarray(conv_factors, dtype=float)
+    if zeros is None or sigmas is None:
+        z, s = fred_inputs()
+        zeros = z if zeros is None else zeros
+        sigmas = s if sigmas is None else sigmas
+    f0 = float(np.atleast_1d(adjusted_zeros(zeros, sigmas, calibration))[0])
+    sig = _extend(sigmas, delivery_year + int(years.max()))
+    spread = spread_bp / 10000.0
+    if base_ctd is None:
+        mid = np.full((1, len(sig)), f0)
+        mid[0, 1:] = f0 * np.exp(10.0 * np.cumsum(sig[1:]))
+        mid_prices = [_bond_values(mid[:, delivery_year:delivery_year + n], c, n, face, spread)[0]
+                      for c, n in zip(coupons, years)]
+        base_ctd = int(np.argmin(np.asarray(mid_prices) / conv_factors))
+
+    n_blocks = -(-n_paths // block)
+    seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+    sizes = [min(block, n_paths - b * block) for b in range(n_blocks)]
+    tasks = [(seeds[b], sizes[b], f0, sig, shift, spread, delivery_year, coupons, years, conv_factors, face, base_ctd)
+             for b in range(n_blocks)]
+    parts = _run_blocks(tasks, workers)
+
+    n = sum(p["n"] for p in parts)
+    tot = {k: sum(p[k] for p in parts) for k in ("fut", "fut2", "opt", "opt2", "pv", "ctd", "switch")}
+    stderr = lambda s1, s2: float(np.sqrt(max(s2 / n - (s1 / n) ** 2, 0.0) / n))
+    basket = pd.DataFrame({"COUPON": coupons, "YEARS": years, "CF": conv_factors,
+                           "PV": tot["pv"] / n, "CTD_PROB": tot["ctd"] / n})
+    return {"futures_price": float(tot["fut"] / n), "futures_stderr": stderr(tot["fut"], tot["fut2"]),
+            "option_value": float(tot["opt"] / n), "option_stderr": stderr(tot["opt"], tot["opt2"]),
+            "switch_prob": tot["switch"] / n, "base_ctd": base_ctd, "basket": basket, "paths": n}
+
+def mc_price_bond(coupon, maturity, zeros, sigmas, shift=FUT_IMPLIED_SHIFT, calibration=CALIBRATION, spread_bp=0.0,
+                  face=100.0, n_paths=MC_PATHS, seed=0):
+    """Annual-pay bond on simulated paths; converges to hjm.price_bond on the same inputs."""
+    f0 = float(np.atleast_1d(adjusted_zeros(zeros, sigmas, calibration))[0])
+    rng = np.random.default_rng(np.random.SeedSequence(seed))
+    paths = simulate_paths(f0, sigmas, n_paths, rng, shift, maturity)
+    return float(_bond_values(paths, coupon, maturity, face, spread_bp / 10000.0).mean())
@@ -1,8 +1,12 @@
 # volatility.py
+import os
 import requests
 import numpy as np
 import pandas as pd
 from datetime import date, timedelta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import config
 
 today = date.today()
@@ -16,10 +20,22 @@ url_ext = ("series_id={series_id}"
     "&observation_start={start}"
     "&observation_end={end}"
     "&file_type=json")
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fred_cache")
 
-def fetch_yields_df(series_id: str) -> pd.DataFrame:
-    full_url = f"{baseurl}?{url_ext.format(series_id=series_id, fred_key=config.fred_key, start=hundred_one_before_yday.isoformat(), end=yesterday.isoformat())}"
-    resp = requests.get(full_url, timeout=30)
+_session = None
+
+def fred_session(pool_size: int = 16) -> requests.Session:
+    """One keep-alive session shared by every series fetch."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        _session.mount("https://", adapter)
+    return _session
+
+def _fetch_observations(series_id: str, start: date, end: date, session=None) -> pd.DataFrame:
+    full_url = f"{baseurl}?{url_ext.format(series_id=series_id, fred_key=config.fred_key, start=start.isoformat(), end=end.isoformat())}"
+    resp = (session or fred_session()).get(full_url, timeout=30)
     resp.raise_for_status()
     data = resp.json()
     obs = data.get("observations", [])
@@ -34,6 +50,57 @@ def fetch_yields_df(series_id: str) -> pd.DataFrame:
         df = df.dropna(subset=["date"]).sort_values("date").reset_index(drop=True)
     return df
 
+def _cache_file(series_id: str, directory: str) -> str:
+    return os.path.join(directory, f"{series_id}.csv")
+
+def load_cached_series(series_id: str, directory: str = cache_dir) -> pd.DataFrame:
+    path = _cache_file(series_id, directory)
+    if not os.path.exists(path):
+        return pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"), "yield_pct": pd.Series(dtype="float64")})
+    df = pd.read_csv(path, parse_dates=["date"])
+    return df.dropna(subset=["date"]).sort_values("date").reset_index(drop=True)
+
+def fetch_yields_df(series_id: str, session=None, directory: str = cache_dir,
+                    start: date = hundred_one_before_yday, end: date = yesterday) -> pd.DataFrame:
+    """
+    Observations for [start, end]. Past observations live in <cache_dir>/<series_id>.csv;
+    only dates after the last cached one (or before the first, if the window grew) are requested.
+    """
+    cached = load_cached_series(series_id, directory)
+    parts = [cached]
+    if cached.empty:
+        parts.append(_fetch_observations(series_id, start, end, session))
+    else:
+        first, last = cached["date"].iloc[0].date(), cached["date"].iloc[-1].date()
+        if (first - start).days > 5:   # weekend/holiday gaps at the window edge are not worth a request
+            parts.append(_fetch_observations(series_id, start, first - timedelta(days=1), session))
+        if last < end:
+            parts.append(_fetch_observations(series_id, last + timedelta(days=1), end, session))
+    if len(parts) > 1:
+        merged = pd.concat([p for p in parts if not p.empty] or parts[:1], ignore_index=True)
+        merged = merged.drop_duplicates("date", keep="last").sort_values("date").reset_index(drop=True)
+        if len(merged) != len(cached):
+            os.makedirs(directory, exist_ok=True)
+            tmp = _cache_file(series_id, directory) + ".tmp"
+            merged.to_csv(tmp, index=False, date_format="%Y-%m-%d")
+            os.replace(tmp, _cache_file(series_id, directory))
+        cached = merged
+    window = (cached["date"] >= pd.Timestamp(start)) & (cached["date"] <= pd.Timestamp(end))
+    return cached.loc[window].reset_index(drop=True)
+
+def fetch_all_yields(series_list, max_workers: int = 8, directory: str = cache_dir) -> dict:
+    """Fetch every series concurrently over the pooled session; values are DataFrames or the raised exception."""
+    session = fred_session(max(max_workers, 1))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {sid: pool.submit(fetch_yields_df, sid, session, directory) for sid in series_list}
+    out = {}
+    for sid, fut in futures.items():
+        try:
+            out[sid] = fut.result()
+        except Exception as e:
+            out[sid] = e
+    return out
+
 def yield_log_vol(df: pd.DataFrame, series_id: str) -> tuple[pd.DataFrame, float]:
     yields = df.copy()
     yields["series"] = series_id
@@ -57,16 +124,102 @@ def yield_log_vol(df: pd.DataFrame, series_id: str) -> tuple[pd.DataFrame, float
 
     return yields, adj
 
+# ─── Rolling estimator ───
+# Same statistic as yield_log_vol: np.std(ddof=n-2) * sqrt(n) == sqrt(SS / 2) * sqrt(n),
+# where SS is the sum of squared deviations of the log yields in the window.
+VOL_WINDOW = 100
+
+def _adj_from_moments(n, ss):
+    return np.sqrt(np.maximum(ss, 0.0) / 2.0) * np.sqrt(n)
+
+class RollingLogVol:
+    """Sliding window of log yields with Welford running moments; push() is O(1)."""
+    def __init__(self, window: int = VOL_WINDOW):
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.ss = 0.0
+
+    def _add(self, x):
+        self.values.append(x)
+        delta = x - self.mean
+        self.mean += delta / len(self.values)
+        self.ss += delta * (x - self.mean)
+
+    def _remove(self):
+        x = self.values.popleft()
+        n = len(self.values)
+        if n == 0:
+            self.mean, self.ss = 0.0, 0.0
+            return
+        delta = x - self.mean
+        self.mean -= delta / n
+        self.ss -= delta * (x - self.mean)
+
+    def push(self, yield_pct) -> float:
+        """Add one observation (non-positive/missing yields are skipped, as in yield_log_vol)."""
+        if yield_pct is not None and np.isfinite(yield_pct) and yield_pct > 0:
+            self._add(round(float(np.log(yield_pct)), 6))
+            if len(self.values) > self.window:
+                self._remove()
+        return self.value()
+
+    def value(self) -> float:
+        n = len(self.values)
+        return round(float(_adj_from_moments(n, self.ss)), 6) if n > 1 else np.nan
+
+    @classmethod
+    def from_yields(cls, yields, window: int = VOL_WINDOW):
+        est = cls(window)
+        for y in np.asarray(yields, dtype=float):
+            est.push(y)
+        return est
+
+_estimators = {}
+
+def update_log_vol(series_id: str, yield_pct: float, window: int = VOL_WINDOW) -> float:
+    """Feed one new observation for a series and refresh config.<series_id>_ln_y100_std."""
+    est = _estimators.setdefault(series_id, RollingLogVol(window))
+    adj = est.push(yield_pct)
+    setattr(config, f"{series_id}_ln_y100_std", adj)
+    return adj
+
+def seed_log_vol(series_id: str, df: pd.DataFrame, window: int = VOL_WINDOW) -> float:
+    """Start (or restart) the rolling estimator for a series from a fetch_yields_df frame."""
+    _estimators[series_id] = RollingLogVol.from_yields(df["yield_pct"].to_numpy(), window)
+    adj = _estimators[series_id].value()
+    setattr(config, f"{series_id}_ln_y100_std", adj)
+    return adj
+
+def rolling_log_vol(yields: pd.DataFrame, window: int = VOL_WINDOW) -> pd.DataFrame:
+    """
+    Batch mode: dates x series matrix of yield_pct -> matrix of the adjusted log-yield
+    vol over the trailing `window` valid observations of each series.
+    """
+    logs = np.log(yields.where(yields > 0)).round(6)
+    out = {}
+    for sid in logs.columns:
+        col = logs[sid].dropna()
+        roll = col.rolling(window, min_periods=2)
+        n = roll.count()
+        ss = roll.var(ddof=0) * n
+        out[sid] = _adj_from_moments(n, ss).round(6).reindex(logs.index).ffill()
+    return pd.DataFrame(out, index=yields.index)
+
 def derive_vol(series_list=None):
 
     if series_list is None:
         series_list = ["THREEFY1", "THREEFY2", "THREEFY3","THREEFY4", "THREEFY5", "THREEFY6", "THREEFY7", "DGS1","DGS2","DGS3","DGS5","DGS7"]
 
     print(f"Date range queried: {hundred_one_before_yday} → {yesterday}")
+    fetched = fetch_all_yields(series_list)
     for sid in series_list:
         try:
-            df = fetch_yields_df(sid)
+            df = fetched[sid]
+            if isinstance(df, Exception):
+                raise df
             df, logvol_adj = yield_log_vol(df, sid)
+            seed_log_vol(sid, df)   # intraday update_log_vol continues from here
             setattr(config, f"{sid}_ln_y100_std", round((logvol_adj), 6))
             adj_val = getattr(config, f"{sid}_ln_y100_std")
             print(f"{sid}: modified std={adj_val}")
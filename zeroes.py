@@ -1,8 +1,11 @@
 import os
+import json
+import hashlib
 import requests
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from functools import lru_cache
 import config
 
 # ─── Configuration ───
@@ -10,6 +13,7 @@ import config
 #config.USTAPI_client_secret
 tcf_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "TCF.xlsx")
 output_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "UST.index.csv")
+tcf_cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "TCF.cache.npz")
 
 # ─── Utilities ───
 def convert_date_format(iso_date):
@@ -24,11 +28,16 @@ def parse_date(date_str):
     if isinstance(date_str, datetime):
         return date_str
     if isinstance(date_str, str):
-        for fmt in ("%Y-%m-%d", "%m/%d/%y", "%m/%d/%Y"):
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
+        return _parse_date_str(date_str)
+    raise ValueError(f"Unrecognized date format: {date_str}")
+
+@lru_cache(maxsize=65536)
+def _parse_date_str(date_str):
+    for fmt in ("%Y-%m-%d", "%m/%d/%y", "%m/%d/%Y"):
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
     raise ValueError(f"Unrecognized date format: {date_str}")
 
 def add_months(dt, months):
@@ -86,6 +95,102 @@ def get_coupon_bounds(issueDate, years_to_maturity, original_maturity):
     next_coupon = add_months(anchor, next_offset)
     return prev_coupon, next_coupon
 
+# ─── Vectorized conversion factors ───
+def _days(values):
+    return pd.to_datetime(pd.Series(np.asarray(values).reshape(-1)), errors="coerce").to_numpy().astype("datetime64[D]")
+
+def add_months_vec(dates, months):
+    """add_months over arrays: datetime64[D] dates shifted by integer months, day clipped to month end."""
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    month = dates.astype("datetime64[M]") + np.asarray(months).astype("timedelta64[M]")
+    day = (dates - dates.astype("datetime64[M]").astype("datetime64[D]")).astype(np.int64)
+    month_len = ((month + 1).astype("datetime64[D]") - month.astype("datetime64[D]")).astype(np.int64)
+    return month.astype("datetime64[D]") + np.minimum(day, month_len - 1).astype("timedelta64[D]")
+
+def coupon_chain(next_cpn, mat_date):
+    """
+    Padded (securities x coupons) matrix of semiannual dates from next_cpn, rolled
+    forward with add_months the way compute_cf does (a day clipped once stays
+    clipped), plus the number of those dates on or before maturity.
+    """
+    next_cpn = np.asarray(next_cpn, dtype="datetime64[D]")
+    mat_date = np.asarray(mat_date, dtype="datetime64[D]")
+    span = (mat_date.astype("datetime64[M]") - next_cpn.astype("datetime64[M]")).astype(np.int64)
+    valid = ~(np.isnat(next_cpn) | np.isnat(mat_date))
+    width = int(max(span[valid].max(initial=0), 0) // 6 + 3)
+
+    month = next_cpn.astype("datetime64[M]")[:, None] + (6 * np.arange(width)).astype("timedelta64[M]")
+    month_len = ((month + 1).astype("datetime64[D]") - month.astype("datetime64[D]")).astype(np.int64)
+    day0 = (next_cpn - next_cpn.astype("datetime64[M]").astype("datetime64[D]")).astype(np.int64) + 1
+    day = np.minimum.accumulate(np.minimum(day0[:, None], month_len), axis=1)
+    chain = month.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+    count = (chain <= mat_date[:, None]).sum(axis=1)
+    return chain, count
+
+def _cf_from_chain(coupon_rate, chain, start, prev_cpn, frac, mat_date, count, yield_rate):
+    """Discount the schedule that starts at chain[:, start] exactly as compute_cf does, in closed form."""
+    rows = np.arange(len(chain))
+    width = chain.shape[1]
+    next_cpn = chain[rows, np.minimum(start, width - 1)]
+    n_dates = np.maximum(count - start, 0)
+    last_full = np.where(n_dates > 0, chain[rows, np.clip(count - 1, 0, width - 1)], next_cpn)
+    stub = mat_date > last_full
+    after_last = add_months_vec(last_full, 6)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = np.where(stub, (mat_date - last_full).astype(float) / (after_last - last_full).astype(float), 1.0)
+    N = np.where(stub, n_dates + 1, n_dates)
+
+    cpn = np.asarray(coupon_rate, dtype=float) / 2.0
+    v = 1 / (1 + yield_rate / 2.0)
+    M = 1 + np.maximum(N - 2, 0)             # first coupon plus the j = 1 .. N-2 loop in compute_cf
+    pv = cpn * v ** frac * (1 - v ** M) / (1 - v)
+    pv += (100 + cpn * delta) * v ** (frac + N - 1)
+    bad = np.isnat(prev_cpn) | np.isnat(next_cpn) | np.isnat(mat_date) | np.isnan(cpn)
+    return np.where(bad, np.nan, pv / 100.0)
+
+def compute_cf_vec(coupon_rate, prev_cpn, next_cpn, mat_date, yield_rate=0.06):
+    """compute_cf for whole columns (delivery at the coupon-period midpoint)."""
+    prev_cpn, next_cpn, mat_date = _days(prev_cpn), _days(next_cpn), _days(mat_date)
+    chain, count = coupon_chain(next_cpn, mat_date)
+    period_days = (next_cpn - prev_cpn).astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.floor(period_days / 2) / period_days   # (next - midpoint).days / (next - prev).days
+    return _cf_from_chain(coupon_rate, chain, np.zeros(len(chain), dtype=np.int64), prev_cpn, frac, mat_date, count, yield_rate)
+
+def compute_cf_matrix(coupon_rate, prev_cpn, next_cpn, mat_date, deliveries, yield_rate=0.06):
+    """
+    Conversion factors for several delivery dates at once: (securities x deliveries).
+    For each delivery the coupon period is rolled forward along the security's
+    coupon chain so that prev <= delivery < next, and the accrual fraction is
+    taken from the actual delivery date.
+    """
+    prev_cpn, next_cpn, mat_date = _days(prev_cpn), _days(next_cpn), _days(mat_date)
+    deliveries = _days(deliveries)
+    chain, count = coupon_chain(next_cpn, mat_date)
+    rows = np.arange(len(chain))
+    out = np.full((len(chain), len(deliveries)), np.nan)
+    for k, delivery in enumerate(deliveries):
+        start = (chain <= delivery).sum(axis=1)
+        start = np.minimum(start, chain.shape[1] - 1)
+        nxt = chain[rows, start]
+        prv = np.where(start > 0, chain[rows, np.maximum(start - 1, 0)], prev_cpn)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frac = (nxt - delivery).astype(float) / (nxt - prv).astype(float)
+        out[:, k] = _cf_from_chain(coupon_rate, chain, start, prv, frac, mat_date, count, yield_rate)
+    return out
+
+def get_coupon_bounds_vec(issue_date, years_to_maturity, original_maturity):
+    """get_coupon_bounds for whole columns; NaT where any input is missing."""
+    anchor = _days(issue_date)
+    elapsed = np.asarray(original_maturity, dtype=float) - np.asarray(years_to_maturity, dtype=float)
+    periods = elapsed / 0.5
+    bad = np.isnat(anchor) | np.isnan(periods)
+    periods = np.where(bad, 0, periods)
+    prev_coupon = add_months_vec(anchor, np.floor(periods).astype(np.int64) * 6)
+    next_coupon = add_months_vec(anchor, np.ceil(periods).astype(np.int64) * 6)
+    nat = np.datetime64("NaT", "D")
+    return np.where(bad, nat, prev_coupon), np.where(bad, nat, next_coupon)
+
 def query_security_detail(cusip, issue_date):
     url = f"https://api.fiscal.treasury.gov/ap/exp/v1/marketable-securities/securities/{cusip}/{issue_date}"
     headers = { "client_id": config.USTAPI_client_id,
@@ -97,12 +202,105 @@ def query_security_detail(cusip, issue_date):
     return response.json()
 
 # ─── Main Logic ───
-def derive_cf():
-    df = pd.read_excel(tcf_path, sheet_name="Security Database", header=2)
-    cols_to_keep = ["OTR Issue", "Original Maturity", "Coupon", "Issue\nDate", "Maturity\nDate", "CUSIP",
-        "Adjusted\nIssuance\n(Billions)", "Original Issuance (Billions)"]
-    df = df[cols_to_keep].copy()
-    df.columns = ["otr_issue", "original_maturity", "coupon", "issue_date_raw", "maturity_date", "cusip", "adjusted_issuance_billions", "original_issuance_billions"]
+# ─── Security database cache ───
+TCF_COLUMNS = {
+    "OTR Issue": "otr_issue", "Original Maturity": "original_maturity", "Coupon": "coupon",
+    "Issue\nDate": "issue_date_raw", "Maturity\nDate": "maturity_date", "CUSIP": "cusip",
+    "Adjusted\nIssuance\n(Billions)": "adjusted_issuance_billions",
+    "Original Issuance (Billions)": "original_issuance_billions"}
+
+def _workbook_key(path, digest=True):
+    st = os.stat(path)
+    key = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+    if digest:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        key["sha256"] = h.hexdigest()
+    return key
+
+def _save_frame_npz(df, path, key):
+    """Columnar .npz: datetimes as datetime64[ns], ints/floats as-is, everything else as str + null mask."""
+    arrays, kinds = {}, {}
+    for i, c in enumerate(df.columns):
+        s = df[c]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            arrays[f"c{i}"], kinds[c] = s.to_numpy(dtype="datetime64[ns]"), "datetime"
+        elif pd.api.types.is_integer_dtype(s) and s.notna().all():
+            arrays[f"c{i}"], kinds[c] = s.to_numpy(dtype=np.int64), "int"
+        elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            arrays[f"c{i}"], kinds[c] = s.to_numpy(dtype=float), "float"
+        else:
+            arrays[f"c{i}"], kinds[c] = s.astype(object).where(s.notna(), "").astype(str).to_numpy(dtype=str), "str"
+            arrays[f"m{i}"] = s.isna().to_numpy()
+    meta = {"key": key, "columns": list(df.columns), "kinds": kinds}
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, __meta__=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp, path)
+
+def _load_frame_npz(path):
+    with np.load(path, allow_pickle=False) as z:
+        meta = json.loads(str(z["__meta__"]))
+        cols = {}
+        for i, c in enumerate(meta["columns"]):
+            values = z[f"c{i}"]
+            if meta["kinds"][c] == "str":
+                values = pd.Series(values, dtype=object).mask(z[f"m{i}"])
+            cols[c] = values
+    return pd.DataFrame(cols), meta["key"]
+
+def load_security_database(path=tcf_path, cache_path=tcf_cache_path):
+    """
+    The "Security Database" sheet of TCF.xlsx, selected and renamed. The parsed frame is
+    kept in a binary .npz next to the workbook, keyed by its mtime, size and sha256, so a
+    warm start skips openpyxl entirely. A re-downloaded workbook with identical bytes
+    still hits the cache (the hash is checked when the mtime moved).
+    """
+    if os.path.exists(cache_path):
+        try:
+            df, key = _load_frame_npz(cache_path)
+            stat_key = _workbook_key(path, digest=False)
+            if all(key.get(k) == v for k, v in stat_key.items()):
+                return df
+            full_key = _workbook_key(path)
+            if key.get("sha256") == full_key["sha256"]:
+                _save_frame_npz(df, cache_path, full_key)
+                return df
+        except Exception as e:
+            print(f"Ignoring unreadable TCF cache {cache_path}: {e}")
+    df = pd.read_excel(path, sheet_name="Security Database", header=2)
+    df = df[list(TCF_COLUMNS)].copy()
+    df.columns = list(TCF_COLUMNS.values())
+    _save_frame_npz(df, cache_path, _workbook_key(path))
+    return df
+
+def _index_fingerprint(df):
+    """Per-row key of every input the conversion factor depends on (CSV round-trip safe)."""
+    key = pd.to_numeric(df["coupon"], errors="coerce").round(6).astype(str)
+    key = key + "|" + pd.to_numeric(df["original_maturity"], errors="coerce").round(6).astype(str)
+    for c in ("issue_date", "maturity_date", "prev_coupon", "next_coupon"):
+        key = key + "|" + pd.to_datetime(df[c], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+    return key
+
+def load_previous_index(path=output_path):
+    if not os.path.exists(path):
+        return None
+    previous = pd.read_csv(path, dtype={"cusip": str})
+    if {"cusip", "conversion_factor"} - set(previous.columns):
+        return None
+    previous["cusip"] = previous["cusip"].astype(str).str.strip()
+    return previous.drop_duplicates("cusip", keep="last").set_index("cusip", drop=False)
+
+def derive_cf(incremental=False, revision=None, path=tcf_path):
+    """
+    Build UST.index.csv from the TCF Security Database. With incremental=True the
+    previous index is diffed by CUSIP: rows whose coupon, dates, original maturity
+    and current coupon period are unchanged keep their conversion factor and
+    tcf_revision stamp, and only new or changed rows are recomputed and stamped
+    with `revision` (the CME "Updated ... Conversion Factors" date).
+    """
+    df = load_security_database(path)
     df = df.dropna(subset=["cusip", "maturity_date"]).copy()
     df["maturity_date"] = pd.to_datetime(df["maturity_date"], errors="coerce")
     df["issue_date"] = df["issue_date_raw"].dt.strftime("%Y-%m-%d")
@@ -134,10 +332,28 @@ def derive_cf():
     df_parse["issue_date"] = df_parse["issue_date"].dt.strftime("%Y-%m-%d")
     df_parse["maturity_date"] = pd.to_datetime(df_parse["maturity_date"], errors="coerce")
     df_parse["maturity_date"] = df_parse["maturity_date"].dt.strftime("%Y-%m-%d")
-    df_parse[["prev_coupon", "next_coupon"]] = df_parse.apply(lambda r: pd.Series(get_coupon_bounds(r["issue_date"], r["years_to_maturity"], r["original_maturity"])),axis=1)
-    df_parse["conversion_factor"] = df_parse.apply(lambda row: round(compute_cf(row["coupon"], row["prev_coupon"], row["next_coupon"], row["maturity_date"]), 6)
+    prev_coupon, next_coupon = get_coupon_bounds_vec(
+        df_parse["issue_date"], df_parse["years_to_maturity"], pd.to_numeric(df_parse["original_maturity"], errors="coerce"))
+    df_parse["prev_coupon"] = pd.to_datetime(prev_coupon)
+    df_parse["next_coupon"] = pd.to_datetime(next_coupon)
 
-        if pd.notna(row["prev_coupon"]) and pd.notna(row["next_coupon"]) else None,axis=1)
+    todo = np.ones(len(df_parse), dtype=bool)
+    cf = np.full(len(df_parse), np.nan)
+    stamps = np.full(len(df_parse), revision, dtype=object)
+    previous = load_previous_index() if incremental else None
+    if previous is not None:
+        same = (df_parse["cusip"].map(_index_fingerprint(previous)) == _index_fingerprint(df_parse)).to_numpy()
+        old_cf = pd.to_numeric(df_parse["cusip"].map(previous["conversion_factor"]), errors="coerce").to_numpy()
+        reuse = same & ~np.isnan(old_cf)
+        cf[reuse] = old_cf[reuse]
+        if "tcf_revision" in previous.columns:
+            stamps[reuse] = df_parse["cusip"].map(previous["tcf_revision"]).to_numpy()[reuse]
+        todo = ~reuse
+    cf[todo] = np.round(compute_cf_vec(pd.to_numeric(df_parse["coupon"], errors="coerce").to_numpy()[todo],
+                                       prev_coupon[todo], next_coupon[todo], df_parse["maturity_date"].to_numpy()[todo]), 6)
+    df_parse["conversion_factor"] = cf
+    df_parse["tcf_revision"] = stamps
+    print(f"Conversion factors recomputed for {int(todo.sum())} of {len(df_parse)} securities (revision {revision}).")
 
     cols_to_drop = [
         "issue_date_raw", "issue_date_x", "prev_coupon_str", "next_coupon_str", "maturity_str", "maturityDate", "interestRate",